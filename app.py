@@ -1,17 +1,61 @@
+import asyncio
+import json
+import os
+import time
 from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
 
 import responder
-import yaml
+from starlette.websockets import WebSocketDisconnect
 
-from controllers.input import is_limited, limit_characters
+from config.loader import load_settings
+from controllers.admission import Admission, AdmissionControl
+from controllers.input import MAX_TEXTS, client_ip, escape_tags, split_chunks
 from presenters import api
-from usecases.japanese.kana_phonetics import Furigana
-from usecases.english.ipa_phonetics import IPA
-from usecases.log import Logs
+from presenters.api import (RequestTimer, bad_request, server_sent_event, service_unavailable, stream_fragment,
+                            too_many_requests)
+from presenters.compression import BrotliMiddleware
+from presenters.pages import Page, serve, static_pages
+from usecases import cache, metrics
+from usecases.executor import ConversionExecutor, Saturated, engine, warm_up
+from usecases.log import open_logs
+from usecases.session import Sessions, SessionFull
 
 
+started = time.perf_counter()
+
+settings = load_settings()
+# Only these languages are loaded and routed by this worker
+languages: tuple[str, ...] = tuple(settings["LANGUAGES"])
+
+executor = ConversionExecutor(kind=settings["EXECUTOR"]["KIND"],
+                              max_workers=settings["EXECUTOR"]["MAX_WORKERS"],
+                              max_queue=settings["EXECUTOR"]["MAX_QUEUE"],
+                              preload=languages if settings["WARMUP"] else ())
+
+logs = open_logs(settings["LOG"])
+
+sessions = Sessions(settings["SESSION"]["MAX_SESSIONS"])
+
+admission = AdmissionControl(max_cost=settings["ADMISSION"]["MAX_COST"],
+                             rate=settings["ADMISSION"]["RATE"],
+                             burst=settings["ADMISSION"]["BURST"],
+                             max_wait=settings["ADMISSION"]["MAX_WAIT"],
+                             max_clients=settings["ADMISSION"]["MAX_CLIENTS"],
+                             costs=settings["ADMISSION"]["COSTS"])
+# Proxies whose X-Forwarded-For names the clients of the logs and the rate limit
+trusted_proxies: int = settings["ADMISSION"]["TRUSTED_PROXIES"]
+
+TEMPLATES_DIR = 'static/templates'
+# Sample texts converted on the pages of GET
+SAMPLES = {
+    "japanese": "樹木希林はFUJIカラーで写せない遠いお正月へ旅立ったよ。",
+    "english": "I just read the article on the newspaper.",
+}
+
 api = responder.API(
-    templates_dir='static/templates',
+    templates_dir=TEMPLATES_DIR,
     auto_escape=True,
     docs_route="/docs",
     title="Pronunciation in HTML",
@@ -26,99 +70,418 @@ api = responder.API(
 )
 
 
-class JapaneseAPI:
-    def __init__(self) -> None:
-        self.furigana = Furigana()
+def log(req, language: str, text: str, html: str) -> None:
+    """Buffer the log of a conversion. It never waits for the database."""
+    if logs is not None:
+        with metrics.stage(language, "log"):
+            logs.create(text, html, client_ip(req, trusted_proxies), language)
+
+
+async def admit(req, resp, language: str, texts: list[str]) -> Optional[tuple[list[str], Admission]]:
+    """
+    Admit the texts by their estimated cost before they are converted.
+    The texts are cut to the budget, and the request waits when its client is over the rate.
+
+    Returns:
+        (Optional[tuple[list[str], Admission]]) The texts to convert and the decision,
+            or None when the request is rejected with 429
+    """
+    admitted, decision = admission.admit(client_ip(req, trusted_proxies), language, texts)
+    if decision.reason is not None:
+        metrics.LIMITED.inc(decision.reason)
+    if decision.is_rejected:
+        too_many_requests(resp, decision.retry_after, decision.report())
+        return None
+    if decision.wait > 0:
+        await asyncio.sleep(decision.wait)
+    return admitted, decision
+
+
+async def pace(client: str, language: str, text: str) -> None:
+    """Charge a text which isn't cut by the budget to the rate of its client, and wait for the rate."""
+    wait = admission.charge(client, language, text)
+    if wait > 0:
+        metrics.LIMITED.inc("rate")
+        await asyncio.sleep(wait)
+
+
+def limited(decision: Admission) -> dict:
+    """The fields of the responses telling whether and why the request was limited"""
+    return {"is-limited": decision.reason is not None, "limit": decision.report()}
+
+
+async def convert_patiently(language: str, text: str) -> str:
+    """Convert the text, waiting for a worker instead of failing when they are saturated."""
+    while True:
+        try:
+            return await executor.convert(language, text)
+        except Saturated:
+            await asyncio.sleep(settings["EXECUTOR"]["RETRY_AFTER"])
+
+
+# Formats of the conversions of the APIs
+FORMATS = ("html", "tokens")
+
+
+async def phonetics(language: str, text: str, output: str) -> dict:
+    """
+    The converted text in the format asked by the client.
 
-    async def post(self, req, resp) -> None:
+    Args:
+        language(str): "japanese" or "english"
+        text(str): Wish the text to add phonetics.
+        output(str): "html" or "tokens"
+
+    Returns:
+        (dict) {"html": HTML} or {"tokens": [[word, reading, start, end], ...]}
+    """
+    if output == "tokens":
+        return {"tokens": await executor.tokens(language, text)}
+    return {"html": await executor.convert(language, text)}
+
+
+def logged(converted: dict) -> str:
+    """The converted text written to the logs"""
+    if "html" in converted:
+        return converted["html"]
+    return json.dumps(converted["tokens"], ensure_ascii=False)
+
+
+class JapaneseAPI:
+    async def on_post(self, req, resp) -> None:
         data = await req.media()
         text = data['raw-text']
-        phonetics = self.furigana.export_html(text)
-        resp.media["date"] = datetime.today()
-        resp.media["is-limited"] = is_limited(text)
-        if is_limited(text):
-            text = limit_characters(text)
-        resp.media["text"] = text
-        resp.media["html"] = phonetics
+        output = data.get("format", "html")
+        if output not in FORMATS:
+            bad_request(resp, f"{output} is not a format of the conversion.")
+            return
+        # The text is limited before the conversion, so the cut part is never converted
+        admitted = await admit(req, resp, "japanese", [text])
+        if admitted is None:
+            return
+        (text,), decision = admitted
+        try:
+            converted = await phonetics("japanese", text, output)
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        resp.media = {"date": datetime.today().isoformat(), **limited(decision), "text": text, **converted}
+        log(req, "japanese", text, logged(converted))
+
+
+class JapaneseBatchAPI:
+    async def on_post(self, req, resp) -> None:
+        data = await req.media()
+        texts = data["raw-texts"]
+        is_over = len(texts) > MAX_TEXTS
+        admitted = await admit(req, resp, "japanese", texts[:MAX_TEXTS])
+        if admitted is None:
+            return
+        texts, decision = admitted
+        media = {"date": datetime.today().isoformat(), **limited(decision)}
+        # The texts over MAX_TEXTS are dropped
+        media["is-limited"] = media["is-limited"] or is_over
+        try:
+            converted = await executor.convert_many(texts,
+                                                    settings["JAPANESE"]["BATCH_SIZE"],
+                                                    settings["JAPANESE"]["N_PROCESS"])
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        resp.media = {**media, "texts": texts, "html": converted}
+        for text, html in zip(texts, converted):
+            log(req, "japanese", text, html)
 
 
 class EnglishAPI:
-    def __init__(self) -> None:
-        self.ipa = IPA()
+    async def on_post(self, req, resp) -> None:
+        data = await req.media()
+        text = data["raw-text"]
+        output = data.get("format", "html")
+        if output not in FORMATS:
+            bad_request(resp, f"{output} is not a format of the conversion.")
+            return
+        admitted = await admit(req, resp, "english", [text])
+        if admitted is None:
+            return
+        (text,), decision = admitted
+        try:
+            converted = await phonetics("english", text, output)
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        resp.media = {"date": datetime.today().isoformat(), **limited(decision), "text": text, **converted}
+        log(req, "english", text, logged(converted))
+
+
+class MixedAPI:
+    """Japanese with English in one text. Kanji get furigana and English words get IPA."""
 
     async def on_post(self, req, resp) -> None:
         data = await req.media()
         text = data["raw-text"]
-        resp.media["date"] = datetime.today()
-        resp.media["is-limited"] = is_limited(text)
-        if is_limited(text):
-            text = limit_characters(text)
-        phonetics = self.ipa.export_html(text)
-        resp.media["text"] = text
-        resp.media["html"] = phonetics
+        output = data.get("format", "html")
+        if output not in FORMATS:
+            bad_request(resp, f"{output} is not a format of the conversion.")
+            return
+        admitted = await admit(req, resp, "mixed", [text])
+        if admitted is None:
+            return
+        (text,), decision = admitted
+        try:
+            converted = {output: await executor.convert_mixed(text, output, settings["JAPANESE"]["BATCH_SIZE"])}
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        resp.media = {"date": datetime.today().isoformat(), **limited(decision), "text": text, **converted}
+        log(req, "mixed", text, logged(converted))
+
+
+class StreamAPI:
+    """
+    Convert a long text chunk by chunk and send each HTML fragment as soon as it is ready.
+    The text isn't cut by the admission control, but each chunk is charged to the rate of the client.
+    """
+    language: str
+
+    async def on_post(self, req, resp) -> None:
+        data = await req.media()
+        text = data["raw-text"]
+        is_event_stream = "text/event-stream" in req.headers.get("Accept", "")
+        if is_event_stream:
+            resp.headers["Content-Type"] = "text/event-stream; charset=utf-8"
+            resp.headers["Cache-Control"] = "no-cache"
+        else:
+            resp.headers["Content-Type"] = "text/html; charset=utf-8"
+        resp.stream(self.fragments, text, is_event_stream, client_ip(req, trusted_proxies))
+
+    async def fragments(self, text: str, is_event_stream: bool, client: str):
+        # The fragments are HTML shown by the browser, so the tags of the text are escaped as on the web pages
+        for chunk, has_break in split_chunks(escape_tags(text)):
+            await pace(client, self.language, chunk)
+            # The stream slows down instead of failing in the middle
+            html = await convert_patiently(self.language, chunk)
+            fragment = stream_fragment(self.language, html, has_break)
+            yield (server_sent_event(fragment) if is_event_stream else fragment).encode("utf-8")
+        if is_event_stream:
+            yield server_sent_event("", event="end").encode("utf-8")
+
+
+class JapaneseStreamAPI(StreamAPI):
+    language = "japanese"
+
+
+class EnglishStreamAPI(StreamAPI):
+    language = "english"
+
+
+async def edit_session(ws, language: str) -> None:
+    """
+    Convert a document while it is edited. Only the changed sentences are converted.
+
+    The client sends {"text": whole text} or {"edit": {"start": int, "end": int, "text": str}},
+    and receives {"version": int, "changes": [{"start": int, "delete": int, "insert": [HTML, ...]}, ...]},
+    which are applied in order to the list of HTML fragments of the sentences.
+    The converted sentences are charged to the rate of the client.
+    """
+    await ws.accept()
+    client = client_ip(ws, trusted_proxies)
+
+    async def render(sentence: str, has_break: bool) -> str:
+        await pace(client, language, sentence)
+        # The fragments are put in the page as HTML, so the tags of the text are escaped
+        html = await convert_patiently(language, escape_tags(sentence))
+        return stream_fragment(language, html, has_break)
+
+    try:
+        session = sessions.open(render, settings["SESSION"]["MAX_CHARACTERS"])
+    except SessionFull as error:
+        await ws.send_json({"error": str(error)})
+        # 1013: Try again later
+        await ws.close(code=1013)
+        return
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(ws.receive(), settings["SESSION"]["IDLE_SECONDS"])
+            except asyncio.TimeoutError:
+                await ws.close(code=1000)
+                return
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                # A binary frame is answered like a text which isn't JSON, and the session goes on
+                if message.get("text") is None:
+                    raise ValueError("The changes are sent in a text frame of JSON.")
+                changes = await session.update(session.apply(json.loads(message["text"])))
+            except (ValueError, AttributeError, SessionFull) as error:
+                await ws.send_json({"error": str(error), "version": session.version})
+                continue
+            await ws.send_json({"version": session.version, "changes": changes})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sessions.close(session)
+
+
+async def japanese_session(ws) -> None:
+    await edit_session(ws, "japanese")
+
+
+async def english_session(ws) -> None:
+    await edit_session(ws, "english")
+
+
+class CacheStats:
+    def on_get(self, req, resp) -> None:
+        resp.media = cache.stats()
+
+
+class Metrics:
+    def on_get(self, req, resp) -> None:
+        resp.text = metrics.render()
+        resp.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def template_page(name: str, **context) -> Page:
+    """A template rendered into a page, which changes with the template."""
+    html = api.template(name, **context)
+    return Page(html.encode("utf-8"), "text/html; charset=utf-8",
+                os.path.getmtime(os.path.join(TEMPLATES_DIR, name)))
+
+
+@lru_cache(maxsize=None)
+def root_page() -> Page:
+    return template_page("root.html")
+
+
+@lru_cache(maxsize=8)
+def sample_page(language: str, version: str) -> Page:
+    """
+    The page of the language with its sample text converted.
+
+    Args:
+        language(str): "japanese" or "english"
+        version(str): Version of the engine, so the page is converted again after the user dictionary is reloaded
+    """
+    raw_text = SAMPLES[language]
+    return template_page(f"{language}.html",
+                         raw_text=raw_text,
+                         converted_text=engine(language).export_html(raw_text))
+
+
+# path: static file read at the start, e.g. "/static/css/basic.css"
+assets = static_pages("static")
 
 
 class Root:
     def on_get(self, req, resp) -> None:
-        resp.html = api.template("root.html")
+        serve(req, resp, root_page())
 
 
-class JapaneseWeb:
-    def __init__(self) -> None:
-        self.furigana = Furigana()
+class StaticAsset:
+    def on_get(self, req, resp, *, name: str) -> None:
+        page = assets.get(req.url.path)
+        if page is None:
+            resp.status_code = 404
+            resp.text = "Not Found"
+            return
+        serve(req, resp, page)
 
+
+class JapaneseWeb:
     def on_get(self, req, resp) -> None:
-        raw_text = "樹木希林はFUJIカラーで写せない遠いお正月へ旅立ったよ。"
-        converted_text = self.furigana.export_html(raw_text)
-        resp.html = api.template('japanese.html',
-                                 raw_text=raw_text,
-                                 converted_text=converted_text)
+        serve(req, resp, sample_page("japanese", engine("japanese").version))
 
     async def on_post(self, req, resp) -> None:
         data = await req.media(format='form')
-        text = data["raw-text"]
-        text = limit_characters(text).replace("<", "&lt").replace(">", "&gt")
-        converted_text = self.furigana.export_html(text)
+        admitted = await admit(req, resp, "japanese", [data["raw-text"]])
+        if admitted is None:
+            return
+        (text,), _ = admitted
+        text = escape_tags(text)
+        try:
+            converted_text = await executor.convert("japanese", text)
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        log(req, "japanese", text, converted_text)
 
-        resp.content = api.template('japanese.html',
-                                    raw_text=text,
-                                    converted_text=converted_text)
+        with metrics.stage("japanese", "template"):
+            resp.content = api.template('japanese.html',
+                                        raw_text=text,
+                                        converted_text=converted_text)
 
 
 class EnglishWeb:
-    def __init__(self) -> None:
-        self.ipa = IPA()
-
     def on_get(self, req, resp) -> None:
-        raw_text = "I just read the article on the newspaper."
-        converted_text = self.ipa.export_html(raw_text)
-        resp.html = api.template('english.html',
-                                 raw_text=raw_text,
-                                 converted_text=converted_text)
+        serve(req, resp, sample_page("english", engine("english").version))
 
     async def on_post(self, req, resp) -> None:
         data: object = await req.media(format='form')
-        text: str = data["raw-text"]
-        text = limit_characters(text).replace("<", "&lt").replace(">", "&gt")
-        converted_text = self.ipa.export_html(text)
+        admitted = await admit(req, resp, "english", [data["raw-text"]])
+        if admitted is None:
+            return
+        (text,), _ = admitted
+        text = escape_tags(text)
+        try:
+            converted_text = await executor.convert("english", text)
+        except Saturated:
+            service_unavailable(resp, settings["EXECUTOR"]["RETRY_AFTER"])
+            return
+        log(req, "english", text, converted_text)
 
-        resp.content = api.template('english.html',
-                                    raw_text=text,
-                                    converted_text=converted_text)
+        with metrics.stage("english", "template"):
+            resp.content = api.template('english.html',
+                                        raw_text=text,
+                                        converted_text=converted_text)
 
 
-api.add_route('/', Root)
-api.add_route('/japanese', JapaneseWeb)
-api.add_route('/english', EnglishWeb)
+def start_up() -> None:
+    """
+    Load the languages and render their pages when WARMUP is set, and report the time to start.
+    Without WARMUP, the pages of the languages are rendered on their first view.
+    """
+    root_page()
+    if settings["WARMUP"]:
+        for language, seconds in warm_up(languages).items():
+            print(f"{language} is loaded in {seconds:.2f} seconds.")
+            sample_page(language, engine(language).version)
+    print(f"Started in {time.perf_counter() - started:.2f} seconds.")
 
 
+api.add_route('/', Root)
+# Served from memory before the static directory of responder
+api.add_route('/static/css/{name}', StaticAsset)
+api.add_route('/static/js/{name}', StaticAsset)
+if "japanese" in languages:
+    api.add_route('/japanese', JapaneseWeb)
+    api.add_route('/japanese/api', JapaneseAPI)
+    api.add_route('/japanese/batch', JapaneseBatchAPI)
+    api.add_route('/japanese/stream', JapaneseStreamAPI)
+    api.add_route('/japanese/session', japanese_session, websocket=True)
+if "english" in languages:
+    api.add_route('/english', EnglishWeb)
+    api.add_route('/english/api', EnglishAPI)
+    api.add_route('/english/stream', EnglishStreamAPI)
+    api.add_route('/english/session', english_session, websocket=True)
+if "japanese" in languages and "english" in languages:
+    api.add_route('/mixed/api', MixedAPI)
+api.add_route('/cache', CacheStats)
+if settings["METRICS"]["ROUTE"]:
+    api.add_route(settings["METRICS"]["ROUTE"], Metrics)
+api.add_middleware(BrotliMiddleware)
+api.add_middleware(RequestTimer, routes=tuple(route.route for route in api.router.routes))
+api.add_event_handler('startup', start_up)
+api.add_event_handler('shutdown', executor.shutdown)
+if logs is not None:
+    api.add_event_handler('shutdown', logs.close)
+
 if __name__ == '__main__':
-    from config import setting
-    with open(f'./config/{setting.MODE}.yaml') as settings:
-        mode = yaml.load(settings, Loader=yaml.FullLoader)
-        ENV = mode['ENV']
-        SERVER = mode['SERVER']
-        PORT = mode['PORT']
+    ENV = settings['ENV']
+    SERVER = settings['SERVER']
+    PORT = settings['PORT']
 
     print(f"Start in {ENV} mode...")
     api.run(address=SERVER, port=PORT)
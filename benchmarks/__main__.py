@@ -0,0 +1,103 @@
+"""
+Benchmark suite of the conversion engines.
+
+    $ python -m benchmarks --output results.json
+    $ python -m benchmarks --output results.json --baseline benchmarks/baseline.json
+
+Every row of the results is keyed by (suite, name, size). Metrics ending with
+"seconds", "bytes" or "blocks" are lower-is-better, the others are higher-is-better, except "errors".
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks import cold_start, load, memory, micro
+
+# Suffixes of the metrics which are better when lower
+LOWER_IS_BETTER = ("seconds", "bytes", "blocks")
+
+
+def metadata() -> dict:
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    Regressions against the baseline.
+
+    Args:
+        results(list[dict]): Rows of this run
+        baseline(list[dict]): Rows of the stored run
+        threshold(float): Allowed ratio, e.g. 0.1 allows 10 % slower
+
+    Returns:
+        list[str]: Descriptions of the regressions
+    """
+    stored = {(row["suite"], row["name"], row["size"]): row for row in baseline}
+    regressions: list[str] = list()
+    for row in results:
+        before = stored.get((row["suite"], row["name"], row["size"]))
+        if before is None:
+            continue
+        for metric, value in row.items():
+            if metric in ("suite", "name", "size") or metric not in before or not before[metric]:
+                continue
+            ratio = value / before[metric]
+            is_worse = ratio > 1 + threshold if metric.endswith(LOWER_IS_BETTER) or metric == "errors" \
+                else ratio < 1 - threshold
+            if is_worse:
+                regressions.append(f"{row['suite']} {row['name']} [{row['size']}] {metric}: "
+                                   f"{before[metric]:.6g} -> {value:.6g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", default=["micro", "memory", "cold_start", "load"],
+                        choices=["micro", "memory", "cold_start", "load"])
+    parser.add_argument("--languages", nargs="+", default=["english", "japanese"], choices=["english", "japanese"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000],
+                        help="characters of the inputs of the microbenchmarks and the memory")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency of the load")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results of a former run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results: list[dict] = list()
+    if "micro" in args.suites:
+        results.extend(micro.run(args.sizes, args.languages))
+    if "memory" in args.suites:
+        results.extend(memory.run(args.sizes, args.languages))
+    if "cold_start" in args.suites:
+        results.extend(cold_start.run(args.languages))
+    if "load" in args.suites:
+        results.extend(load.run(args.languages, args.concurrency, args.requests))
+
+    with open(args.output, mode="w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+    for row in results:
+        metrics = ", ".join(f"{key}={value:.6g}" for key, value in row.items() if key not in ("suite", "name", "size"))
+        print(f"{row['suite']:>10} {row['name']:<36} {row['size']:>7}  {metrics}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Cold start of the engines. Each measurement runs in a new interpreter,
+so nothing is shared with the process of the benchmark.
+"""
+import json
+import subprocess
+import sys
+
+from benchmarks.common import result
+
+# name: code printing the seconds to load
+SCRIPTS: dict[str, str] = {
+    "cmu_index.build": (
+        "import time; from usecases.english import cmu_index; s = time.perf_counter(); "
+        "cmu_index.build(path='/tmp/cmudict.bench.idx'); print(time.perf_counter() - s)"
+    ),
+    "IPA.load": (
+        "import time; s = time.perf_counter(); from usecases.english.ipa_phonetics import IPA; "
+        "IPA().export_html('the'); print(time.perf_counter() - s)"
+    ),
+    "Furigana.load": (
+        "import time; s = time.perf_counter(); from usecases.japanese.kana_phonetics import Furigana; "
+        "Furigana().export_html('漢字'); print(time.perf_counter() - s)"
+    ),
+}
+
+LANGUAGES: dict[str, str] = {
+    "cmu_index.build": "english",
+    "IPA.load": "english",
+    "Furigana.load": "japanese",
+}
+
+
+def measure(script: str, repeat: int) -> float:
+    """Best seconds of the script in new interpreters"""
+    seconds: list[float] = list()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        seconds.append(float(output.splitlines()[-1]))
+    return min(seconds)
+
+
+def run(languages: list[str], repeat: int = 3) -> list[dict]:
+    # The index is built once, so IPA.load measures opening it
+    subprocess.run([sys.executable, "-c", "from usecases.english import cmu_index; cmu_index.load()"], check=True)
+
+    rows: list[dict] = list()
+    for name, script in SCRIPTS.items():
+        if LANGUAGES[name] in languages:
+            rows.append(result("cold_start", name, 0, seconds=measure(script, repeat)))
+    return rows
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(["english", "japanese"]), indent=2))
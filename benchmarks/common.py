@@ -0,0 +1,40 @@
+import statistics
+import timeit
+from typing import Callable
+
+ENGLISH = "The quick onyx goblin jumps over the lazy dwarf. I just read the article on the newspaper."
+JAPANESE = "樹木希林はFUJIカラーで写せない遠いお正月へ旅立ったよ。すももももももももの内。"
+
+
+def sized_text(sample: str, size: int) -> str:
+    """The sample repeated to `size` characters. The repeats are separated by a space like sentences."""
+    sample = f"{sample} "
+    return (sample * (size // len(sample) + 1))[:size].rstrip()
+
+
+def best_seconds(func: Callable, repeat: int = 5) -> float:
+    """Best time of one call, called enough times to measure."""
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """p50, p95 and p99 of the samples"""
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98]}
+
+
+def result(suite: str, name: str, size: int, **metrics: float) -> dict:
+    """
+    A row of the results.
+
+    Args:
+        suite(str): "micro", "memory", "cold_start" or "load"
+        name(str): What is measured
+        size(int): Characters of the input, or the concurrency of the load
+        metrics(float): Seconds, bytes and blocks are lower-is-better, the other metrics are higher-is-better.
+
+    Returns:
+        (dict)
+    """
+    return {"suite": suite, "name": name, "size": size, **metrics}
@@ -0,0 +1,54 @@
+"""
+Compare docs/sec of `Furigana.export_html` in a loop against `Furigana.export_html_many`.
+
+    $ python -m benchmarks.furigana_batch --docs 2000 --batch-size 64 --n-process 1
+"""
+import argparse
+import time
+
+from usecases.japanese.kana_phonetics import Furigana
+
+SUBTITLES = (
+    "樹木希林はFUJIカラーで写せない遠いお正月へ旅立ったよ。",
+    "すももももももももの内",
+    "まるで将棋だな",
+    "東西南北、どこへ行っても同じ景色だ。",
+    "明日の天気は晴れのち曇りでしょう。",
+    "ありがとう。",
+)
+
+
+def make_texts(count: int) -> list[str]:
+    """Short subtitle lines, each a little different to avoid identical documents."""
+    return [f"{SUBTITLES[i % len(SUBTITLES)]}{i}" for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    furigana = Furigana()
+    texts = make_texts(args.docs)
+    # Warm up the pipeline before measuring
+    furigana.export_html_many(texts[:10])
+
+    start = time.perf_counter()
+    looped = [furigana.export_html(text) for text in texts]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    piped = furigana.export_html_many(texts, batch_size=args.batch_size, n_process=args.n_process)
+    pipe_seconds = time.perf_counter() - start
+
+    assert looped == piped, "export_html_many must return the same HTML as export_html"
+    print(f"export_html loop : {args.docs / loop_seconds:10.1f} docs/sec")
+    print(f"export_html_many : {args.docs / pipe_seconds:10.1f} docs/sec "
+          f"(batch_size={args.batch_size}, n_process={args.n_process})")
+    print(f"speed up         : {loop_seconds / pipe_seconds:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the reading backends of Furigana: model load time, throughput and peak RSS.
+
+Each backend runs in its own process, so the memory of one doesn't count for another.
+
+    $ python -m benchmarks.japanese_backends --docs 2000
+"""
+import argparse
+import hashlib
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.furigana_batch import make_texts
+
+
+def measure(name: str, docs: int) -> dict:
+    """Runs inside the child process."""
+    from usecases.japanese import backends
+
+    start = time.perf_counter()
+    backend = backends.load(name)
+    load_seconds = time.perf_counter() - start
+
+    texts = make_texts(docs)
+    start = time.perf_counter()
+    parsed = list(backend.parse_many(texts))
+    parse_seconds = time.perf_counter() - start
+
+    return {
+        "backend": name,
+        "load_seconds": load_seconds,
+        "docs_per_second": docs / parse_seconds,
+        # kilobytes on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "digest": hashlib.sha1(json.dumps([list(words) for words in parsed],
+                                          ensure_ascii=False).encode("utf-8")).hexdigest(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", default=["ginza", "tokenizer", "sudachi"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.docs)))
+        return
+
+    results = list()
+    for name in args.backends:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.japanese_backends",
+                                 "--child", name, "--docs", str(args.docs)],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+
+    print(f"{'backend':>10} {'load (s)':>10} {'docs/sec':>10} {'RSS (MB)':>10}  "
+          f"same readings as {results[0]['backend']}")
+    for result in results:
+        print(f"{result['backend']:>10} {result['load_seconds']:>10.2f} {result['docs_per_second']:>10.1f} "
+              f"{result['max_rss_mb']:>10.1f}  {result['digest'] == results[0]['digest']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+In-process load generator. The ASGI app of `app.py` is called directly,
+so the numbers include responder and the executor but no network.
+"""
+import asyncio
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import ENGLISH, JAPANESE, percentiles, result, sized_text
+
+SAMPLES: dict[str, str] = {
+    "english": ENGLISH,
+    "japanese": JAPANESE,
+}
+
+
+async def request(app, method: str, path: str, body: bytes = b"",
+                  headers: dict[str, str] = None) -> tuple[int, float]:
+    """
+    Call the ASGI app once.
+
+    Returns:
+        tuple[int, float]: Status code and seconds until the response is complete
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or dict()).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 80),
+    }
+    received = False
+    status = 0
+
+    async def receive() -> dict:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client never disconnects
+        await asyncio.Future()
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return status, time.perf_counter() - start
+
+
+async def drive(app, language: str, concurrency: int, requests: int, size: int) -> dict:
+    """POST distinct texts to the web route of the language with `concurrency` clients."""
+    bodies = [urlencode({"raw-text": f"{i} {sized_text(SAMPLES[language], size)}"}).encode()
+              for i in range(requests)]
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    latencies: list[float] = list()
+    statuses: dict[int, int] = dict()
+    queue = iter(bodies)
+
+    async def client() -> None:
+        for body in queue:
+            status, seconds = await request(app, "POST", f"/{language}", body, headers)
+            latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    return result("load", f"POST /{language}", concurrency,
+                  requests_per_second=requests / wall,
+                  errors=sum(count for status, count in statuses.items() if status != 200),
+                  **{f"{name}_seconds": value for name, value in percentiles(latencies).items()})
+
+
+def run(languages: list[str], concurrencies: list[int], requests: int = 200, size: int = 200) -> list[dict]:
+    from app import api
+
+    rows: list[dict] = list()
+    for language in languages:
+        for concurrency in concurrencies:
+            rows.append(asyncio.run(drive(api, language, concurrency, requests, size)))
+    return rows
@@ -0,0 +1,78 @@
+"""
+Memory of the words of Furigana per token, measured by tracemalloc.
+
+The columnar buffer of the words is compared with the former list of (word, katakana) tuples,
+and the fused render with the former stages, each of which built a list of the whole text.
+"""
+import gc
+import tracemalloc
+from typing import Callable
+
+from benchmarks.common import JAPANESE, result, sized_text
+
+
+def traced(func: Callable) -> tuple[object, int, int]:
+    """
+    Memory of a call.
+
+    Returns:
+        (tuple[object, int, int]) The value, the peak bytes during the call,
+            and the blocks still allocated by the call while the value is alive
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = func()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    return value, peak, blocks
+
+
+def japanese(sizes: list[int]) -> list[dict]:
+    from usecases.japanese.kana_phonetics import Furigana
+    from usecases.japanese.words import WordBuffer
+
+    furigana = Furigana()
+
+    def held_buffer(words: WordBuffer) -> WordBuffer:
+        held = WordBuffer(words.text)
+        held.extend(words, 0)
+        return held
+
+    def former_render(words: WordBuffer) -> str:
+        # _fetch_characters, _remove_ascii_and_hiragana and _put_on of the former pipeline
+        tuples = list(words)
+        return "".join(furigana._put_on(furigana._remove_ascii_and_hiragana(tuples)))
+
+    def fused_render(words: WordBuffer) -> str:
+        # Every word is put on as if it wasn't seen, as the former pipeline did
+        furigana.word_cache.clear()
+        return furigana._render(words)
+
+    rows: list[dict] = list()
+    for size in sizes:
+        text = sized_text(JAPANESE, size)
+        words = furigana._fetch_words_many([text])[0]
+        tokens = len(words)
+        for name, func in (("Furigana.words.tuples", lambda: list(words)),
+                           ("Furigana.words.columnar", lambda: held_buffer(words)),
+                           ("Furigana.render.stages", lambda: former_render(words)),
+                           ("Furigana.render.fused", lambda: fused_render(words))):
+            _, peak, blocks = traced(func)
+            rows.append(result("memory", name, size,
+                               peak_bytes_per_token=peak / tokens, blocks_per_token=blocks / tokens))
+        furigana.html_cache.clear()
+        furigana.word_cache.clear()
+        _, peak, blocks = traced(lambda: furigana.export_html(text))
+        rows.append(result("memory", "Furigana.export_html", size,
+                           peak_bytes_per_token=peak / tokens, blocks_per_token=blocks / tokens))
+    return rows
+
+
+def run(sizes: list[int], languages: list[str]) -> list[dict]:
+    rows: list[dict] = list()
+    if "japanese" in languages:
+        rows.extend(japanese(sizes))
+    return rows
@@ -0,0 +1,41 @@
+"""Microbenchmarks of each stage of IPA and Furigana across input sizes."""
+from benchmarks.common import ENGLISH, JAPANESE, best_seconds, result, sized_text
+
+
+def english(sizes: list[int]) -> list[dict]:
+    from usecases.english.ipa_phonetics import IPA
+
+    ipa = IPA()
+    rows: list[dict] = list()
+    for size in sizes:
+        sentences = [sized_text(ENGLISH, size)]
+        phonetics = ipa._fetch_phonetics(sentences)
+        rows.append(result("micro", "IPA._fetch_phonetics", size,
+                           seconds=best_seconds(lambda: ipa._fetch_phonetics(sentences))))
+        rows.append(result("micro", "IPA._put_on", size,
+                           seconds=best_seconds(lambda: ipa._put_on(phonetics))))
+    return rows
+
+
+def japanese(sizes: list[int]) -> list[dict]:
+    from usecases.japanese.kana_phonetics import Furigana
+
+    furigana = Furigana()
+    rows: list[dict] = list()
+    for size in sizes:
+        sentences = [sized_text(JAPANESE, size)]
+        words = furigana._fetch_characters(sentences)
+        rows.append(result("micro", "Furigana._fetch_characters", size,
+                           seconds=best_seconds(lambda: furigana._fetch_characters(sentences), repeat=3)))
+        rows.append(result("micro", "Furigana._render", size,
+                           seconds=best_seconds(lambda: furigana._render(words))))
+    return rows
+
+
+def run(sizes: list[int], languages: list[str]) -> list[dict]:
+    rows: list[dict] = list()
+    if "english" in languages:
+        rows.extend(english(sizes))
+    if "japanese" in languages:
+        rows.extend(japanese(sizes))
+    return rows
@@ -0,0 +1,54 @@
+"""
+Per-character cost of preparing the text in `export_html`.
+
+The engines used to rebuild the input one character at a time with `line += word`.
+They now join the lines once with `normalize`.
+
+    $ python -m benchmarks.text_assembly
+"""
+import argparse
+import timeit
+
+from usecases.cache import normalize
+
+LINE = "The quick onyx goblin jumps over the lazy dwarf. 樹木希林はFUJIカラーで写せない遠いお正月へ旅立ったよ。"
+
+
+def rebuild_per_character(text_post: str) -> list[str]:
+    """The former preparation of `export_html`"""
+    sentences: list = list()
+    line: str = ""
+
+    texts = "<br>\n".join(text_post.splitlines())
+
+    for text in texts:
+        for word in text:
+            line += word
+    sentences.append(line)
+    return sentences
+
+
+def join_once(text_post: str) -> list[str]:
+    """The current preparation of `export_html`"""
+    return [normalize(text_post)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'characters':>12} {'per character':>16} {'join once':>16} {'speed up':>10}")
+    for size in args.sizes:
+        text = "\n".join([LINE] * (size // (len(LINE) + 1) + 1))[:size]
+        assert rebuild_per_character(text) == join_once(text)
+
+        number = max(1, 1_000_000 // size)
+        old = min(timeit.repeat(lambda: rebuild_per_character(text), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: join_once(text), number=number, repeat=args.repeat)) / number
+        print(f"{size:>12,} {old / size * 1e9:>13.1f} ns {new / size * 1e9:>13.1f} ns {old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from functools import lru_cache
+
+import yaml
+
+from config import setting
+
+# Values used when the YAML file of the mode doesn't have them.
+DEFAULTS: dict = {
+    # Languages served by this worker. The others are never loaded.
+    "LANGUAGES": ["japanese", "english"],
+    # Load the languages at start up instead of the first request
+    "WARMUP": False,
+    "JAPANESE": {
+        "BACKEND": "ginza",
+        "BATCH_SIZE": 64,
+        "N_PROCESS": 1,
+    },
+    "ENGLISH": {
+        # Guess the IPA of the words missing in the CMU dictionary
+        "FALLBACK": True,
+        # Seconds between the reports of the missing words
+        "OOV_FLUSH_INTERVAL": 60.0,
+    },
+    # Compiled user dictionaries by `python -m usecases.user_dict`. Empty disables them.
+    "USER_DICT": {
+        "JAPANESE": "",
+        "ENGLISH": "",
+        # Seconds between the checks for a new compiled file
+        "RELOAD_INTERVAL": 5.0,
+    },
+    "CACHE": {
+        "WORDS": 50_000,
+        "HTML": 1_000,
+        "OOV": 10_000,
+        # File of SQLite shared by the workers on the host. Empty disables the disk cache.
+        "DISK_PATH": "",
+        # Seconds the converted texts are kept on the disk. 0 keeps them until they are evicted.
+        "DISK_TTL": 604_800,
+        "DISK_ENTRIES": 100_000,
+    },
+    "LOG": {
+        "BACKEND": "none",
+        "MAX_CONNECTIONS": 4,
+        "SQLITE_PATH": "./logs.sqlite3",
+        # Logs kept by the memory backend; the oldest ones are discarded
+        "MEMORY_ENTRIES": 10_000,
+        "MAX_QUEUE": 10_000,
+        "BATCH_SIZE": 500,
+        "FLUSH_INTERVAL": 1.0,
+        "OVERFLOW": "drop",
+    },
+    # Requests are admitted by the milliseconds of CPU estimated before they are converted
+    "ADMISSION": {
+        # Milliseconds allowed for a request. The texts over it are cut.
+        "MAX_COST": 100.0,
+        # Milliseconds per second allowed for a client. 0 disables the rate limit.
+        "RATE": 500.0,
+        # Milliseconds a client can spend at once
+        "BURST": 2_000.0,
+        # Seconds a request can wait for its client's rate before it is rejected with 429
+        "MAX_WAIT": 2.0,
+        # Clients tracked by the rate limit
+        "MAX_CLIENTS": 10_000,
+        # Proxies in front of the app whose X-Forwarded-For is trusted. 0 keys the clients on the peer address.
+        "TRUSTED_PROXIES": 0,
+        # Milliseconds of each unit of the text by language
+        "COSTS": {
+            "japanese": {"CHARACTER": 0.002, "PARSED_CHARACTER": 0.1},
+            "english": {"CHARACTER": 0.002, "WORD": 0.02},
+        },
+    },
+    "SESSION": {
+        # WebSocket sessions of live editing open at once in a worker
+        "MAX_SESSIONS": 100,
+        # Characters of the document kept by a session
+        "MAX_CHARACTERS": 20_000,
+        # A session is closed after this number of seconds without an edit
+        "IDLE_SECONDS": 300,
+    },
+    "METRICS": {
+        # Route of the metrics in the text format of Prometheus. Empty disables it.
+        "ROUTE": "/metrics",
+        # Conversions slower than this are profiled and reported. 0 disables the profiler.
+        "SLOW_SECONDS": 0,
+        "SAMPLE_INTERVAL": 0.005,
+        "TOP_STACKS": 5,
+    },
+    "EXECUTOR": {
+        "KIND": "thread",
+        "MAX_WORKERS": 4,
+        "MAX_QUEUE": 16,
+        "RETRY_AFTER": 1,
+    },
+}
+
+
+def _merge(defaults: dict, loaded: dict) -> dict:
+    """Overwrite the defaults by the loaded values, section by section."""
+    merged = dict(defaults)
+    for key, value in loaded.items():
+        if isinstance(value, dict) and isinstance(defaults.get(key), dict):
+            merged[key] = _merge(defaults[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+@lru_cache(maxsize=None)
+def load_settings(mode: str = setting.MODE) -> dict:
+    """
+    Read `config/<mode>.yaml` and fill the missing values by DEFAULTS.
+
+    Args:
+        mode(str): Name of the YAML file, e.g. "test"
+
+    Returns:
+        (dict) Settings
+    """
+    with open(f'./config/{mode}.yaml') as settings:
+        loaded = yaml.load(settings, Loader=yaml.FullLoader) or dict()
+    return _merge(DEFAULTS, loaded)
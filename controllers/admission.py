@@ -0,0 +1,230 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from controllers.input import RE_SENTENCE
+
+RE_KANJI = re.compile("[一-龥]")
+RE_WORD = re.compile(r"[A-Za-z']+")
+
+
+def estimate_cost(language: str, text: str, costs: dict[str, dict[str, float]]) -> float:
+    """
+    Milliseconds of CPU which the conversion of the text is expected to take, by one cheap scan.
+
+    Args:
+        language(str): "japanese", "english" or "mixed"
+        text(str): Text to convert
+        costs(dict[str, dict[str, float]]): Milliseconds of each unit by language, ADMISSION.COSTS of the settings.
+            For Japanese, every character is scanned and only the sentences with kanji are parsed by the model.
+            For English, every character is scanned and every word is looked up.
+
+    Returns:
+        (float) Estimated milliseconds
+    """
+    return sum(_sentence_costs(language, text, costs))
+
+
+def _sentence_costs(language: str, text: str, costs: dict[str, dict[str, float]]) -> list[float]:
+    """Estimated milliseconds of each sentence matched by RE_SENTENCE"""
+    sentence_costs: list[float] = list()
+    for match in RE_SENTENCE.finditer(text):
+        sentence = match.group()
+        cost = 0.0
+        if language in ("japanese", "mixed") and RE_KANJI.search(sentence):
+            cost += costs["japanese"]["PARSED_CHARACTER"] * len(sentence)
+        if language in ("english", "mixed"):
+            cost += costs["english"]["WORD"] * len(RE_WORD.findall(sentence))
+        cost += costs["japanese" if language == "japanese" else "english"]["CHARACTER"] * len(sentence)
+        sentence_costs.append(cost)
+    return sentence_costs
+
+
+def fit_budget(language: str, text: str, budget: float,
+               costs: dict[str, dict[str, float]]) -> tuple[str, float]:
+    """
+    The longest head of the text within the budget, cut on a sentence when possible.
+
+    Args:
+        language(str): "japanese", "english" or "mixed"
+        text(str): Text to convert
+        budget(float): Milliseconds allowed
+        costs(dict[str, dict[str, float]]): Milliseconds of each unit by language
+
+    Returns:
+        (tuple[str, float]) The head of the text and its estimated milliseconds
+    """
+    total = 0.0
+    for match, cost in zip(RE_SENTENCE.finditer(text), _sentence_costs(language, text, costs)):
+        if cost > 0 and total + cost > budget:
+            # A sentence over the rest of the budget is cut in proportion to its cost
+            characters = int(len(match.group()) * (budget - total) / cost)
+            return text[:match.start() + characters], total + cost * characters / len(match.group())
+        total += cost
+    return text, total
+
+
+class TokenBucket:
+    """
+    Milliseconds of CPU a client can spend, refilled at a constant rate.
+    The cost of a request is spent when it is admitted, even when the balance doesn't cover it yet;
+    the request then waits until the balance is refilled, and so do the requests after it.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """
+        Args:
+            rate(float): Milliseconds refilled per second
+            burst(float): Milliseconds held at most
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait(self, cost: float = 0.0) -> float:
+        """Seconds until the balance covers the cost, 0 when it already does"""
+        self._refill()
+        return max(0.0, cost - self.tokens) / self.rate
+
+    def spend(self, cost: float) -> None:
+        self._refill()
+        self.tokens -= cost
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class Admission(NamedTuple):
+    # Estimated milliseconds of CPU of the texts
+    cost: float
+    # Seconds to wait before the conversion, to keep the client under its rate
+    wait: float
+    # Why the request is limited: "cost" or "rate", None when it isn't
+    reason: Optional[str]
+    # Seconds until the client can send the request, when it is rejected
+    retry_after: float = 0.0
+
+    @property
+    def is_rejected(self) -> bool:
+        return self.retry_after > 0
+
+    def report(self) -> Optional[dict]:
+        """Why the request was limited, for the response"""
+        if self.reason is None:
+            return None
+        if self.reason == "cost":
+            message = "The text was cut to the budget of the CPU time of a text."
+        elif self.is_rejected:
+            message = "Too many conversions from this client. Please retry later."
+        else:
+            message = "The conversion was delayed to keep this client under its rate."
+        return {"reason": self.reason, "message": message, "cost": round(self.cost, 3),
+                "wait": round(self.wait, 3), "retry-after": round(self.retry_after, 3)}
+
+
+class AdmissionControl:
+    """
+    Admit the requests by their estimated cost before they are converted.
+
+    The texts of a request over the budget are cut to it, and each client spends the cost of its requests
+    from a token bucket. A request is admitted when the balance of its client covers its cost within max_wait,
+    and waits for it; it is rejected beyond, so a client is never more than rate * max_wait in debt.
+    """
+
+    def __init__(self, costs: dict[str, dict[str, float]], max_cost: float = 100.0, rate: float = 500.0,
+                 burst: float = 2_000.0, max_wait: float = 2.0, max_clients: int = 10_000) -> None:
+        """
+        Args:
+            costs(dict[str, dict[str, float]]): Milliseconds of each unit by language, ADMISSION.COSTS of the settings
+            max_cost(float): Milliseconds of CPU allowed for a request, for all of its texts
+            rate(float): Milliseconds of CPU per second allowed for a client. 0 disables the rate limit.
+            burst(float): Milliseconds of CPU a client can spend at once
+            max_wait(float): Seconds a request can wait for its client's rate
+            max_clients(int): Number of clients tracked; the least recent ones are forgotten
+        """
+        self.max_cost = max_cost
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_clients = max_clients
+        self.costs = costs
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admit(self, client: str, language: str, texts: list[str]) -> tuple[list[str], Admission]:
+        """
+        Decide how the texts of a request are converted.
+
+        Args:
+            client(str): Address of the client
+            language(str): "japanese", "english" or "mixed"
+            texts(list[str]): Texts of the request
+
+        Returns:
+            (tuple[list[str], Admission]) The texts cut to the budget of the request, and the decision.
+                The texts after the one which is cut are dropped.
+                The texts are empty when the request is rejected.
+        """
+        admitted: list[str] = list()
+        cost = 0.0
+        reason: Optional[str] = None
+        for text in texts:
+            head, text_cost = fit_budget(language, text, self.max_cost - cost, self.costs)
+            admitted.append(head)
+            cost += text_cost
+            if len(head) < len(text):
+                # The budget is spent, so the next texts are dropped
+                reason = "cost"
+                break
+
+        if self.rate <= 0:
+            return admitted, Admission(cost, 0.0, reason)
+        with self._lock:
+            bucket = self._bucket(client)
+            wait = bucket.wait(cost)
+            if wait > self.max_wait:
+                # The request is admitted once the wait is within max_wait
+                return list(), Admission(cost, 0.0, "rate", retry_after=wait - self.max_wait)
+            # The cost is spent now, so the requests waiting together don't exceed the rate
+            bucket.spend(cost)
+        if wait > 0 and reason is None:
+            reason = "rate"
+        return admitted, Admission(cost, wait, reason)
+
+    def charge(self, client: str, language: str, text: str) -> float:
+        """
+        Spend the cost of a text which isn't cut by the budget, e.g. a chunk of a stream.
+        It is never rejected; it waits as long as its client's rate needs.
+
+        Args:
+            client(str): Address of the client
+            language(str): "japanese" or "english"
+            text(str): Text to convert
+
+        Returns:
+            (float) Seconds to wait before the conversion
+        """
+        if self.rate <= 0:
+            return 0.0
+        cost = estimate_cost(language, text, self.costs)
+        with self._lock:
+            bucket = self._bucket(client)
+            wait = bucket.wait(cost)
+            bucket.spend(cost)
+        return wait
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[client] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
@@ -1,29 +1,95 @@
-MAX_CHARACTERS = 1_000
+import re
+from typing import Iterator
 
+MAX_TEXTS = 1_000
+# Characters converted at once by the streaming routes
+CHUNK_CHARACTERS = 500
+# A sentence ends with "。", "！", "？", "!", "?" or "." before a space, and closing brackets after them.
+# The sentences never cross a line break; in a text of many lines, the line breaks go with the sentence before them.
+RE_SENTENCE = re.compile(r".*?(?:[。！？!?]+|\.(?=\s|$))[」』）)\"']*\s*|.+$", re.MULTILINE)
 
-def is_limited(text: str) -> bool:
+
+def client_ip(req, trusted_proxies: int = 0) -> str:
     """
-    When the text over the MAX_CHARACTERS, it return True.
+    Address of the client.
+
+    X-Forwarded-For is written by anyone, so it is only read behind the proxies we run.
+    Each of them appends the address it got the request from, so the client is the right-most hop
+    that none of them added; the hops on its left come from the client and are ignored.
 
     Args:
-        text(str): Original text
+        req: Request of responder, or WebSocket of starlette
+        trusted_proxies(int): Proxies in front of the app, 0 when the clients connect to it directly
 
     Returns:
-        (bool)
+        (str) IP address
+    """
+    if trusted_proxies:
+        hops = [hop.strip() for hop in req.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        if hops:
+            return hops[max(len(hops) - trusted_proxies, 0)]
+    client = getattr(req, "_starlette", req).client
+    return client.host if client else ""
+
+
+def escape_tags(text: str) -> str:
+    """The text with "<" and ">" escaped, so it can't put tags in the converted HTML"""
+    return text.replace("<", "&lt").replace(">", "&gt")
+
+
+def split_chunks(text: str, max_characters: int = CHUNK_CHARACTERS) -> Iterator[tuple[str, bool]]:
     """
-    if len(text) > MAX_CHARACTERS:
-        return True
-    return False
+    Split the text on line and sentence boundaries, for converting it piece by piece.
 
+    Args:
+        text(str): Original text, which can be longer than the budget of a request
+        max_characters(int): Maximum characters of a chunk
 
-def limit_characters(text: str) -> str:
+    Yields:
+        (tuple[str, bool]) A chunk, and whether a line break follows it
     """
-    Limit to the number of characters.
+    lines = text.splitlines()
+    for number, line in enumerate(lines):
+        has_break = number < len(lines) - 1
+        chunks = list(_split_line(line, max_characters)) or [""]
+        for i, chunk in enumerate(chunks):
+            yield chunk, has_break and i == len(chunks) - 1
+
+
+def split_sentences(text: str) -> list[tuple[str, bool]]:
+    """
+    Split the text into sentences, for converting only the edited ones.
 
     Args:
         text(str): Original text
 
     Returns:
-        (str) The text is limited to the number of characters.
+        (list[tuple[str, bool]]) Sentences, and whether a line break follows each of them
     """
-    return text[:MAX_CHARACTERS]
+    sentences: list[tuple[str, bool]] = list()
+    lines = text.splitlines()
+    for number, line in enumerate(lines):
+        has_break = number < len(lines) - 1
+        matches = [match.group() for match in RE_SENTENCE.finditer(line)] or [""]
+        sentences.extend((sentence, has_break and i == len(matches) - 1) for i, sentence in enumerate(matches))
+    return sentences
+
+
+def _split_line(line: str, max_characters: int) -> Iterator[str]:
+    """Sentences of a line packed into chunks of max_characters."""
+    chunk = ""
+    for match in RE_SENTENCE.finditer(line):
+        sentence = match.group()
+        if len(chunk) + len(sentence) <= max_characters:
+            chunk += sentence
+            continue
+        if chunk:
+            yield chunk
+        # A sentence longer than a chunk is split on the last space, or anywhere when it has none.
+        while len(sentence) > max_characters:
+            cut = sentence.rfind(" ", 0, max_characters) + 1 or max_characters
+            yield sentence[:cut]
+            sentence = sentence[cut:]
+        chunk = sentence
+    if chunk:
+        yield chunk
@@ -1,4 +1,99 @@
+import math
 from datetime import datetime
 
-from usecases.english.ipa_phonetics import IPA
-from usecases.japanese.kana_phonetics import Furigana
+from usecases import metrics
+
+
+def service_unavailable(resp, retry_after: int) -> None:
+    """
+    Tell the client that the conversions are saturated and when to retry.
+
+    Args:
+        resp: Response of responder
+        retry_after(int): Seconds to wait before retrying
+    """
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(retry_after)
+    resp.media = {"error": "The server is busy. Please retry later."}
+
+
+def too_many_requests(resp, retry_after: float, limit: dict) -> None:
+    """
+    Tell the client that it is over its rate and when to retry.
+
+    Args:
+        resp: Response of responder
+        retry_after(float): Seconds to wait before retrying
+        limit(dict): Why the request is rejected
+    """
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(math.ceil(retry_after))
+    resp.media = {"error": limit["message"], "limit": limit}
+
+
+def bad_request(resp, message: str) -> None:
+    """
+    Tell the client that the request is invalid.
+
+    Args:
+        resp: Response of responder
+        message(str): What is wrong
+    """
+    resp.status_code = 400
+    resp.media = {"error": message}
+
+
+def stream_fragment(language: str, html: str, has_break: bool) -> str:
+    """
+    HTML of a chunk converted by the streaming routes.
+
+    Args:
+        language(str): "japanese" or "english"
+        html(str): Converted chunk
+        has_break(bool): A line break follows the chunk
+
+    Returns:
+        (str) The fragment, joined with the line break as `export_html` does
+    """
+    if not has_break:
+        return html
+    if language == "english":
+        # IPA puts a space after every word, but not before a line break
+        html = html.rstrip(" ")
+    return f"{html}<br>\n"
+
+
+def server_sent_event(data: str, event: str = "fragment") -> str:
+    """
+    A message of Server-Sent Events.
+
+    Args:
+        data(str): Payload, which can have line breaks
+        event(str): Name of the event
+
+    Returns:
+        (str) The message
+    """
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+class RequestTimer:
+    """ASGI middleware observing the seconds of each HTTP request by its route."""
+
+    def __init__(self, app, routes: tuple[str, ...]) -> None:
+        """
+        Args:
+            app: ASGI application
+            routes(tuple[str, ...]): Routes labeled by their path. The others are labeled "other".
+        """
+        self.app = app
+        self.routes = frozenset(routes)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"] if scope["path"] in self.routes else "other"
+        with metrics.REQUEST_SECONDS.time(scope["method"], route):
+            await self.app(scope, receive, send)
@@ -0,0 +1,107 @@
+from typing import Optional
+
+
+def accepts(scope, encoding: str) -> bool:
+    """The client accepts the content coding, e.g. "br" in "gzip, deflate, br" """
+    for key, value in scope["headers"]:
+        if key == b"accept-encoding":
+            for part in value.decode("latin-1").split(","):
+                name, _, parameters = part.strip().partition(";")
+                if name.strip() == encoding and parameters.replace(" ", "") not in ("q=0", "q=0.0"):
+                    return True
+    return False
+
+
+class BrotliMiddleware:
+    """
+    ASGI middleware compressing the responses with Brotli when the client accepts it.
+    The other clients are left to the GZip middleware of responder.
+    Brotli is optional; without the package, every response goes on to GZip.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, quality: int = 4) -> None:
+        """
+        Args:
+            app: ASGI application
+            minimum_size(int): Bytes under which a response isn't compressed
+            quality(int): 0 (fastest) to 11 (smallest)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.quality = quality
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        self._brotli = brotli
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self._brotli is None or not accepts(scope, "br"):
+            await self.app(scope, receive, send)
+            return
+
+        # The inner GZip middleware must not compress the response again
+        headers = [(key, value) for key, value in scope["headers"] if key != b"accept-encoding"]
+        responder = _BrotliResponder(self._brotli, send, self.minimum_size, self.quality)
+        await self.app(dict(scope, headers=headers), receive, responder.send)
+
+
+class _BrotliResponder:
+    """Compress the messages of one response"""
+
+    def __init__(self, brotli, send, minimum_size: int, quality: int) -> None:
+        self.brotli = brotli
+        self._send = send
+        self.minimum_size = minimum_size
+        self.quality = quality
+        self.start: Optional[dict] = None
+        self.compressor = None
+        self.is_passing = False
+
+    async def send(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            # The headers are sent when the first body tells how to compress it
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.is_passing:
+            await self._send(message)
+        elif self.compressor is not None:
+            # The rest of a stream. Every chunk is flushed, so the client gets it at once.
+            chunk = self.compressor.process(body) + self.compressor.flush()
+            if not more_body:
+                chunk += self.compressor.finish()
+            await self._send({**message, "body": chunk})
+        elif self._is_encoded() or (len(body) < self.minimum_size and not more_body):
+            self.is_passing = True
+            await self._send(self.start)
+            await self._send(message)
+        elif not more_body:
+            body = self.brotli.compress(body, quality=self.quality)
+            await self._send(self._encoded_start(len(body)))
+            await self._send({**message, "body": body})
+        else:
+            self.compressor = self.brotli.Compressor(quality=self.quality)
+            chunk = self.compressor.process(body) + self.compressor.flush()
+            await self._send(self._encoded_start(None))
+            await self._send({**message, "body": chunk})
+
+    def _is_encoded(self) -> bool:
+        return any(key.lower() == b"content-encoding" for key, _ in self.start["headers"])
+
+    def _encoded_start(self, length: Optional[int]) -> dict:
+        """The start message with the headers of the compressed body"""
+        headers = [(key, value) for key, value in self.start["headers"]
+                   if key.lower() not in (b"content-length", b"vary")]
+        vary = [value for key, value in self.start["headers"] if key.lower() == b"vary"]
+        headers.append((b"content-encoding", b"br"))
+        headers.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return {**self.start, "headers": headers}
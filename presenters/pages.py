@@ -0,0 +1,109 @@
+import hashlib
+import mimetypes
+import os
+from collections.abc import Mapping
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+
+class Page:
+    """A response computed once and served from memory with its validators."""
+
+    def __init__(self, body: bytes, content_type: str, modified: float,
+                 cache_control: str = "no-cache") -> None:
+        """
+        Args:
+            body(bytes): Content of the response
+            content_type(str): e.g. "text/html; charset=utf-8"
+            modified(float): Seconds since the epoch when the content last changed
+            cache_control(str): "no-cache" makes the browsers revalidate the page on every view
+        """
+        self.body = body
+        self.content_type = content_type
+        # Strong validator, the same in every worker as it only depends on the content
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        # HTTP dates have no fraction of a second
+        self.modified = int(modified)
+        self.last_modified = formatdate(self.modified, usegmt=True)
+        self.cache_control = cache_control
+
+    def headers(self) -> dict[str, str]:
+        """Headers of both the full response and 304"""
+        return {"ETag": self.etag, "Last-Modified": self.last_modified, "Cache-Control": self.cache_control}
+
+    def is_not_modified(self, request_headers: Mapping) -> bool:
+        """
+        The client already has this page, as told by If-None-Match or If-Modified-Since.
+
+        Args:
+            request_headers(Mapping): Headers of the request, with lower case names
+
+        Returns:
+            (bool) 304 can be sent
+        """
+        if_none_match: Optional[str] = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-Modified-Since is ignored when If-None-Match is sent (RFC 7232 3.3)
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        if_modified_since: Optional[str] = request_headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.modified <= since
+        return False
+
+
+def serve(req, resp, page: Page) -> None:
+    """
+    Send the page, or 304 without the body when the client has it.
+
+    Args:
+        req: Request of responder
+        resp: Response of responder
+        page(Page): Page to send
+    """
+    if page.is_not_modified(req.headers):
+        resp.status_code = 304
+        resp.content = b""
+    else:
+        resp.content = page.body
+        resp.headers["Content-Type"] = page.content_type
+    resp.headers.update(page.headers())
+
+
+def file_page(path: str, cache_control: str = "public, max-age=3600") -> Page:
+    """A static file read into a page"""
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    with open(path, mode="rb") as f:
+        body = f.read()
+    return Page(body, content_type, os.path.getmtime(path), cache_control)
+
+
+def static_pages(directory: str, route: str = "/static",
+                 subdirectories: tuple[str, ...] = ("css", "js")) -> dict[str, Page]:
+    """
+    The files of the static directories read into pages.
+
+    Args:
+        directory(str): Directory of the static files, e.g. "static"
+        route(str): Path where the directory is served
+        subdirectories(tuple[str, ...]): Directories to read, e.g. ("css", "js")
+
+    Returns:
+        (dict[str, Page]) path: page, e.g. "/static/css/basic.css"
+    """
+    pages: dict[str, Page] = dict()
+    for subdirectory in subdirectories:
+        for current, _, names in os.walk(os.path.join(directory, subdirectory)):
+            for name in names:
+                path = os.path.join(current, name)
+                relative = os.path.relpath(path, directory).replace(os.sep, "/")
+                pages[f"{route}/{relative}"] = file_page(path)
+    return pages
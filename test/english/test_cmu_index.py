@@ -0,0 +1,39 @@
+import pytest
+
+from usecases.english import cmu_index
+
+
+@pytest.fixture
+def dict_dir(tmp_path):
+    (tmp_path / "cmudict").write_text("the DH AH0\nonyx AA1 N IH0 K S\nabc's EY1 B IY2 S IY2 Z\n", encoding="utf-8")
+    (tmp_path / "symbols").write_text("AA\nAA1 ɑ́ː\nAH0 ə\nB b\nDH ð\nEY1 éɪ\nIH0 ɪ\nIY2 ìː\nK k\nN n\nS s\nZ z\n",
+                                      encoding="utf-8")
+    (tmp_path / "vowels").write_text("ɑ́ː ə éɪ ɪ ìː", encoding="utf-8")
+    return tmp_path
+
+
+def test_build_and_lookup(dict_dir):
+    path = str(dict_dir / "cmudict.idx")
+    assert cmu_index.build(str(dict_dir), path) == 3
+
+    index = cmu_index.CMUIndex(path)
+    assert index["the"] == "ðə"
+    assert index["onyx"] == "ɑ́ːnɪks"
+    assert index["abc's"] == "éɪbìːsìːz"
+    assert "pen" not in index
+    with pytest.raises(KeyError):
+        index["pen"]
+    assert list(index) == ["abc's", "onyx", "the"]
+    assert index.vowels == ("ɑ́ː", "ə", "éɪ", "ɪ", "ìː")
+
+
+def test_load_rebuilds_stale_index(dict_dir):
+    path = str(dict_dir / "cmudict.idx")
+    cmu_index.load(str(dict_dir), path)
+
+    (dict_dir / "cmudict").write_text("pen P EH1 N\n", encoding="utf-8")
+    (dict_dir / "symbols").write_text("EH1 ɜ́\nN n\nP p\n", encoding="utf-8")
+
+    index = cmu_index.load(str(dict_dir), path)
+    assert index["pen"] == "pɜ́n"
+    assert "the" not in index
@@ -0,0 +1,32 @@
+import pytest
+
+from usecases.english import g2p
+
+DICTIONARY = {"news": "núz", "paper": "péɪpɜːr", "newspaper": "núzpèɪpɜːr", "the": "ðə", "pen": "pɜ́n"}
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("newspaperthe", ["newspaper", "the"]),
+    ("thepen", ["the", "pen"]),
+    ("newspaper", None),
+    ("thex", None),
+])
+def test_split_known(word, expected):
+    assert g2p.split_known(word, DICTIONARY) == expected
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("qwzxv", "kwzksv"),
+    ("chatter", "ʧætɜːr"),
+    ("cider", "sɪdɜːr"),
+    ("gem", "ʤɛm"),
+    ("yappy", "jæpiː"),
+    ("bake", "bæk"),
+])
+def test_letters_to_sound(word, expected):
+    assert g2p.letters_to_sound(word) == expected
+
+
+def test_guess():
+    assert g2p.guess("thepen", DICTIONARY) == "ðəpɜ́n"
+    assert g2p.guess("zed", DICTIONARY) == "zɛd"
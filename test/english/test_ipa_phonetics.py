@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from usecases.english.ipa_phonetics import *
@@ -28,3 +30,62 @@ def test_export_html(sentences, expected):
 
     actual = phonetic.export_html(sentences)
     assert actual == expected
+
+
+def test_state_is_not_shared_between_calls():
+    phonetic = IPA()
+
+    phonetic.export_html("the apple")
+    assert phonetic._fetch_phonetics(["read the"]) == [("read", "rɜ́d"), ("the", "ðə")]
+    assert phonetic._fetch_phonetics(["the apple", "the pen"]) == [
+        ("the", "ðiː"), ("apple", "ǽpəl"), ("the", "ðə"), ("pen", "pɜ́n")]
+
+
+def test_export_html_in_parallel():
+    phonetic = IPA()
+    texts = ["I just read the article on the newspaper.",
+             "The quick onyx goblin jumps over the lazy dwarf.\nNow I Know My ABC's.",
+             "the apple and the pen", "This is a pen."]
+    expected = [phonetic.export_html(text) for text in texts]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        actual = list(executor.map(phonetic.export_html, texts * 1_000))
+
+    assert actual == expected * 1_000
+
+
+def test_export_html_is_cached():
+    phonetic = IPA()
+    text = "The cached sentence\nis cached."
+    info = phonetic.html_cache.cache_info()
+
+    first = phonetic.export_html(text)
+    second = phonetic.export_html(text.replace("\n", "\r\n"))
+
+    assert first == second
+    assert phonetic.html_cache.cache_info()["hits"] == info["hits"] + 1
+    assert phonetic.word_cache.get(("cached", phonetic.dict_data["cached"])) is not None
+
+
+def test_missing_word_is_guessed_once(capsys):
+    phonetic = IPA()
+    info = phonetic.oov_cache.cache_info()
+
+    assert phonetic._fetch_phonetics(["the newspaperthe"]) == [
+        ("the", "ðə"), ("newspaperthe", phonetic.dict_data["newspaper"] + phonetic.dict_data["the"])]
+    phonetic._fetch_phonetics(["newspaperthe"])
+
+    assert capsys.readouterr().out == ""
+    assert phonetic.oov_cache.cache_info()["misses"] == info["misses"] + 1
+    assert phonetic.oov_cache.cache_info()["hits"] == info["hits"] + 1
+
+
+def test_export_tokens():
+    phonetic = IPA()
+    text = "I read\r\nthe 123 apple."
+
+    actual = phonetic.export_tokens(text)
+    assert [(word, ipa) for word, ipa, _, _ in actual] == [
+        ("I", phonetic.dict_data["i"]), ("read", phonetic.dict_data["read"]),
+        ("the", "ðiː"), ("apple.", phonetic.dict_data["apple"])]
+    assert all(text[start:end] == word for word, _, start, end in actual)
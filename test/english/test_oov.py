@@ -0,0 +1,23 @@
+from usecases.english.oov import OOVWords
+
+
+def test_flush_reports_once(capsys):
+    oov = OOVWords(flush_interval=0)
+    for word in ["qwzxv", "qwzxv", "zyx"]:
+        oov.add(word)
+
+    assert capsys.readouterr().out == ""
+    assert oov.flush() == {"qwzxv": 2, "zyx": 1}
+    assert capsys.readouterr().out == "3 words are nothing in the CMU dictionary: qwzxv(2), zyx(1)\n"
+    assert oov.flush() == {}
+    assert capsys.readouterr().out == ""
+    assert oov.total == 3
+
+
+def test_max_words(capsys):
+    oov = OOVWords(flush_interval=0, max_words=1)
+    for word in ["a", "b", "a"]:
+        oov.add(word)
+
+    assert oov.flush() == {"a": 2}
+    assert capsys.readouterr().out.startswith("3 words")
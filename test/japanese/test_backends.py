@@ -0,0 +1,104 @@
+import pytest
+
+from usecases.japanese import backends
+
+
+class Morpheme:
+    def __init__(self, surface, reading):
+        self._surface = surface
+        self._reading = reading
+
+    def surface(self):
+        return self._surface
+
+    def reading_form(self):
+        return self._reading
+
+
+class Tokenizer:
+    """Splits on the given morphemes, as SudachiPy does"""
+
+    def __init__(self, morphemes):
+        self.morphemes = morphemes
+
+    def tokenize(self, text, mode):
+        return [Morpheme(surface, reading) for surface, reading in self.morphemes]
+
+
+def sudachi(morphemes):
+    backend = backends.SudachiBackend.__new__(backends.SudachiBackend)
+    backend.tokenizer = Tokenizer(morphemes)
+    backend.mode = None
+    return backend
+
+
+# yapf: disable
+@pytest.mark.parametrize("text, morphemes, expected",
+                         (
+                            (
+                                "将棋 だな",
+                                [("将棋", "ショウギ"), (" ", " "), ("だ", "ダ"), ("な", "ナ")],
+                                [("将棋", "ショウギ"), ("だ", "ダ"), ("な", "ナ")]
+                            ),
+                            (
+                                " 将棋  だ\n",
+                                [(" ", " "), ("将棋", "ショウギ"), (" ", " "), (" ", " "), ("だ", "ダ"), ("\n", "\n")],
+                                [(" ", " "), ("将棋", "ショウギ"), (" ", " "), ("だ", "ダ"), ("\n", "\n")]
+                            ),
+                            (
+                                "  ",
+                                [(" ", " "), (" ", " ")],
+                                [("  ", "  ")]
+                            ),
+                            (
+                                "",
+                                [],
+                                []
+                            ),
+                         )
+                         )
+# yapf: enable
+def test_sudachi_aligns_spaces_as_spacy(text, morphemes, expected):
+    assert list(sudachi(morphemes).parse(text)) == expected
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        backends.load("mecab")
+
+
+# yapf: disable
+@pytest.mark.parametrize("name", ("ginza", "tokenizer", "sudachi"))
+@pytest.mark.parametrize("text, expected",
+                         (
+                            ("東西南北", [("東西南北", "トウザイナンボク")]),
+                            ("まるで将棋だな", [("まるで", "マルデ"), ("将棋", "ショウギ"), ("だ", "ダ"), ("な", "ナ")]),
+                            ("FUJIカラーで写そう", [("FUJI", "フジ"), ("カラー", "カラー"), ("で", "デ"), ("写そう", "ウツソウ")]),
+                         )
+                         )
+# yapf: enable
+def test_backends_give_the_same_readings(name, text, expected):
+    pytest.importorskip("sudachipy" if name == "sudachi" else "spacy")
+    assert list(backends.load(name).parse(text)) == expected
+
+
+# yapf: disable
+@pytest.mark.parametrize("text, morphemes",
+                         (
+                            ("かな だけ", [("かな", "カナ"), (" ", " "), ("だけ", "ダケ")]),
+                            (" FUJI  カラー\n", [(" ", " "), ("FUJI", "フジ"), (" ", " "), (" ", " "),
+                                              ("カラー", "カラー"), ("\n", "\n")]),
+                            ("", []),
+                         )
+                         )
+# yapf: enable
+def test_plain_words_are_spaced_as_parse(text, morphemes):
+    parsed = "".join(word for word, _ in sudachi(morphemes).parse(text))
+    assert "".join(word for word, _ in backends.plain_words(text)) == parsed
+    assert all(reading == "" for _, reading in backends.plain_words(text))
+
+
+def test_sudachi_offsets_are_in_the_text():
+    text = " 将棋  だ\n"
+    words = sudachi([(" ", " "), ("将棋", "ショウギ"), (" ", " "), (" ", " "), ("だ", "ダ"), ("\n", "\n")]).parse(text)
+    assert all(text[start:end] == word for word, _, start, end in words.spans())
@@ -1,6 +1,7 @@
 import pytest
 
 import usecases.japanese.kana_phonetics as add_phonetic
+from usecases.user_dict import ReloadingDictionary, build
 
 
 class TestKana:
@@ -52,7 +53,7 @@ class TestKana:
     def test_fetch_characters(self, text, expected):
         ruby = add_phonetic.Furigana()
         actual = ruby._fetch_characters(text)
-        assert actual == expected
+        assert list(actual) == expected
 
     # yapf: disable
     @pytest.mark.parametrize("words, expected",
@@ -133,3 +134,54 @@ class TestKana:
         ruby = add_phonetic.Furigana()
         actual = ruby._put_on(words_list)
         assert actual == expected
+
+    def test_export_html_many(self):
+        ruby = add_phonetic.Furigana()
+        texts = ["東西南北", "すももももももももの内", "まるで将棋だな\nFUJIカラーで写そう"]
+        actual = ruby.export_html_many(texts, batch_size=2)
+        assert actual == [ruby.export_html(text) for text in texts]
+
+    def test_split_sentences(self):
+        ruby = add_phonetic.Furigana()
+        actual = ruby._split_sentences("漢字。 かなだけ！<br>\nFUJI")
+        assert actual == ["漢字。 ", "かなだけ！", "<br>\n", "FUJI"]
+
+    def test_export_html_parses_only_kanji(self, monkeypatch):
+        ruby = add_phonetic.Furigana()
+        parsed = list()
+        parse_many = ruby.backend.parse_many
+
+        def recorded(texts, **kwargs):
+            texts = list(texts)
+            parsed.extend(texts)
+            return parse_many(texts, **kwargs)
+
+        monkeypatch.setattr(ruby.backend, "parse_many", recorded)
+        assert ruby.export_html("ひらがなとカタカナ。") == "ひらがなとカタカナ。"
+        assert ruby.export_html("かなだけ。東西南北。") == \
+            "かなだけ。<ruby>東西南北<rp>(</rp><rt>とうざいなんぼく</rt><rp>)</rp></ruby>。"
+        assert parsed == ["東西南北。"]
+
+    def test_export_tokens(self):
+        ruby = add_phonetic.Furigana()
+        text = "まるで将棋だな\r\nFUJIカラーで写そう"
+        actual = ruby.export_tokens(text)
+        assert actual == [("将棋", "しょうぎ", 3, 5), ("写そう", "うつそう", 17, 20)]
+
+    def test_user_dictionary(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "names.dic")
+        build({"樹木希林".encode(): "キキキリン"}, path)
+        ruby = add_phonetic.Furigana()
+        monkeypatch.setattr(add_phonetic.Furigana, "user_dict", ReloadingDictionary(path, interval=0))
+        parsed = list()
+        parse_many = ruby.backend.parse_many
+
+        def recorded(texts, **kwargs):
+            texts = list(texts)
+            parsed.extend(texts)
+            return parse_many(texts, **kwargs)
+
+        monkeypatch.setattr(ruby.backend, "parse_many", recorded)
+        words = ruby._fetch_words_many(["はい樹木希林は東西南北"])[0]
+        assert list(words)[:2] == [("はい", ""), ("樹木希林", "キキキリン")]
+        assert parsed == ["は東西南北"]
@@ -0,0 +1,29 @@
+from usecases.japanese.backends import plain_words
+from usecases.japanese.words import WordBuffer
+
+
+def test_words_are_slices_of_the_text():
+    words = WordBuffer("将棋だな")
+    words.append(0, 2, "ショウギ")
+    words.append(2, 3, "ダ")
+    words.append(3, 4, "ナ")
+
+    assert len(words) == 3
+    assert words.surface(0) == "将棋"
+    assert list(words) == [("将棋", "ショウギ"), ("だ", "ダ"), ("な", "ナ")]
+    assert list(words.spans())[1] == ("だ", "ダ", 2, 3)
+
+
+def test_extend_moves_the_offsets():
+    words = WordBuffer("かな。将棋")
+    words.extend(plain_words("かな。"), 0)
+    parsed = WordBuffer("将棋")
+    parsed.append(0, 2, "ショウギ")
+    words.extend(parsed, 3)
+
+    assert list(words.spans()) == [("かな。", "", 0, 3), ("将棋", "ショウギ", 3, 5)]
+
+
+def test_plain_words_skip_the_spaces_after_words():
+    words = plain_words(" かな  だけ")
+    assert list(words) == [(" かな", ""), (" だけ", "")]
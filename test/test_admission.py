@@ -0,0 +1,118 @@
+import pytest
+
+from config.loader import load_settings
+from controllers.admission import AdmissionControl, TokenBucket, estimate_cost, fit_budget
+
+COSTS = load_settings()["ADMISSION"]["COSTS"]
+
+
+def test_estimate_cost():
+    kana = "ひらがなだけです。" * 10
+    kanji = "漢字の文です。" * 10
+
+    # Only the sentences with kanji are parsed, so they cost more than their characters
+    assert estimate_cost("japanese", kanji, COSTS) > estimate_cost("japanese", kana, COSTS) * 10
+    assert estimate_cost("english", "This is a pen.", COSTS) == pytest.approx(
+        COSTS["english"]["WORD"] * 4 + COSTS["english"]["CHARACTER"] * 14)
+    assert estimate_cost("mixed", "漢字 and words", COSTS) > estimate_cost("japanese", "漢字 and words", COSTS)
+    assert estimate_cost("japanese", "", COSTS) == 0
+    # The line breaks aren't sentences of their own
+    assert estimate_cost("japanese", "漢字です\n\n漢字です", COSTS) == pytest.approx(
+        estimate_cost("japanese", "漢字です漢字です", COSTS))
+
+
+def test_fit_budget():
+    text = "漢字です。" * 10
+    sentence_cost = estimate_cost("japanese", "漢字です。", COSTS)
+
+    head, cost = fit_budget("japanese", text, sentence_cost * 3, COSTS)
+    assert head == "漢字です。" * 3
+    assert cost == pytest.approx(sentence_cost * 3)
+    # A sentence over the budget is cut inside
+    head, cost = fit_budget("japanese", text, sentence_cost * 2.5, COSTS)
+    assert head == "漢字です。" * 2 + "漢字"
+    assert cost <= sentence_cost * 2.5
+    assert fit_budget("japanese", text, 1_000, COSTS) == (text, pytest.approx(sentence_cost * 10))
+
+
+def test_token_bucket(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("controllers.admission.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10.0, burst=20.0)
+
+    bucket.spend(30.0)
+    assert bucket.wait() == pytest.approx(1.0)
+    now[0] = 1.0
+    assert bucket.wait() == 0
+    now[0] = 100.0
+    bucket.spend(0)
+    assert bucket.tokens == 20.0
+
+
+def test_admit(monkeypatch):
+    monkeypatch.setattr("controllers.admission.time.monotonic", lambda: 0.0)
+    admission = AdmissionControl(COSTS, max_cost=1.0, rate=1.0, burst=1.0, max_wait=0.5)
+    text = "漢字です。" * 10
+
+    texts, decision = admission.admit("10.0.0.1", "japanese", [text])
+    assert decision.reason == "cost"
+    assert len(texts[0]) < len(text)
+    assert decision.report()["reason"] == "cost"
+
+    # The balance is spent, and a request waits while the balance is refilled within max_wait
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字"])
+    assert decision.reason == "rate" and 0 < decision.wait <= 0.5
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字"])
+    assert decision.reason == "rate" and 0 < decision.wait <= 0.5
+    # The debt is never more than max_wait
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字"])
+    assert decision.is_rejected and texts == []
+    assert 0 < decision.retry_after <= 0.5
+
+    # The other clients have their own rate
+    texts, decision = admission.admit("10.0.0.2", "english", ["This is a pen."])
+    assert texts == ["This is a pen."]
+    assert decision.reason is None and decision.report() is None
+
+
+def test_balance_covers_the_cost(monkeypatch):
+    monkeypatch.setattr("controllers.admission.time.monotonic", lambda: 0.0)
+    admission = AdmissionControl(COSTS, max_cost=100.0, rate=1.0, burst=1.0, max_wait=0.5)
+
+    # A positive balance doesn't let a request far over it through
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字です。" * 100])
+    assert decision.is_rejected and texts == []
+    assert admission._buckets["10.0.0.1"].tokens == 1.0
+
+
+def test_budget_of_a_batch():
+    admission = AdmissionControl(COSTS, max_cost=100.0, rate=0)
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字です。" * 400] * 1_000)
+
+    assert decision.reason == "cost"
+    assert decision.cost <= 100.0
+    assert len(texts) == 1
+    assert "".join(texts) == ("漢字です。" * 400)[:len(texts[0])]
+
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字です。"] * 1_000)
+    assert decision.cost <= 100.0
+    assert 100 < len(texts) < 1_000
+
+
+def test_forget_clients():
+    admission = AdmissionControl(COSTS, max_clients=2)
+    for client in ("a", "b", "c"):
+        admission.admit(client, "english", ["pen"])
+    assert list(admission._buckets) == ["b", "c"]
+
+
+def test_charge(monkeypatch):
+    monkeypatch.setattr("controllers.admission.time.monotonic", lambda: 0.0)
+    admission = AdmissionControl(COSTS, rate=1.0, burst=1.0, max_wait=0.5)
+    chunk = "漢字です。" * 10
+
+    # A chunk of a stream is never rejected, but waits for the rate like the requests
+    assert admission.charge("10.0.0.1", "japanese", chunk) > 0
+    texts, decision = admission.admit("10.0.0.1", "japanese", ["漢字"])
+    assert decision.is_rejected
+    assert AdmissionControl(COSTS, rate=0).charge("10.0.0.1", "japanese", chunk) == 0
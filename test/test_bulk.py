@@ -0,0 +1,49 @@
+import json
+
+from usecases.bulk import Checkpoint, parse_args, run
+from usecases.english.ipa_phonetics import IPA
+
+TEXTS = ["I read the article.", "", "The apple.", "This is a pen."]
+
+
+def corpus(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text("\n".join(TEXTS) + "\n", encoding="utf-8")
+    return path
+
+
+def test_ordered_output(tmp_path):
+    output = tmp_path / "corpus.html"
+    written = run(parse_args(["english", str(corpus(tmp_path)), "--output", str(output),
+                              "--workers", "2", "--chunk-size", "1"]))
+
+    assert written == len(TEXTS)
+    assert output.read_text(encoding="utf-8").splitlines() == [IPA().export_html(text) for text in TEXTS]
+    assert not (tmp_path / "corpus.html.checkpoint").exists()
+
+
+def test_jsonl(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text('{"id": 1, "body": "the apple"}\n\n{"id": 2, "body": "a pen"}\n', encoding="utf-8")
+    output = tmp_path / "out.jsonl"
+    run(parse_args(["english", str(path), "--input-format", "jsonl", "--field", "body", "--format", "tokens",
+                    "--output-field", "tokens", "--output", str(output), "--workers", "0"]))
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [record["id"] for record in records] == [1, 2]
+    assert records[1]["tokens"] == [list(token) for token in IPA().export_tokens("a pen")]
+
+
+def test_resume(tmp_path):
+    output = tmp_path / "corpus.html"
+    expected = [IPA().export_html(text) + "\n" for text in TEXTS]
+    written = "".join(expected[:2]).encode("utf-8")
+    # Crashed after the checkpoint of two records, in the middle of the third
+    output.write_bytes(written + b"<ruby>broken")
+    Checkpoint(f"{output}.checkpoint").save(2, len(written))
+
+    resumed = run(parse_args(["english", str(corpus(tmp_path)), "--output", str(output), "--workers", "0",
+                              "--chunk-size", "1", "--resume"]))
+
+    assert resumed == 2
+    assert output.read_text(encoding="utf-8") == "".join(expected)
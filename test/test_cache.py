@@ -0,0 +1,33 @@
+from usecases.cache import CACHES, LRUCache, normalize, stats, text_key
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache("test.evict", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.cache_info() == {"hits": 3, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2}
+
+
+def test_disabled():
+    cache = LRUCache("test.disabled", maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_stats():
+    cache = LRUCache("test.stats", maxsize=1)
+    assert CACHES["test.stats"] is cache
+    assert stats()["test.stats"]["maxsize"] == 1
+
+
+def test_text_key():
+    assert normalize("a\r\nb\n") == "a<br>\nb"
+    assert text_key(normalize("a\r\nb")) == text_key(normalize("a\nb"))
+    assert text_key(normalize("a\n\nb")) != text_key(normalize("a\nb"))
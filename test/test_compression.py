@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from presenters.compression import BrotliMiddleware, accepts
+
+brotli = pytest.importorskip("brotli")
+
+
+def application(chunks, headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html"), *headers]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i + 1 < len(chunks)})
+        app.scope = scope
+    return app
+
+
+def request(app, accept_encoding=b"gzip, br"):
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding)]}
+    messages = list()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(BrotliMiddleware(app, minimum_size=10)(scope, None, send))
+    return dict(messages[0]["headers"]), [message["body"] for message in messages[1:]]
+
+
+def test_accepts():
+    assert accepts({"headers": [(b"accept-encoding", b"gzip, deflate, br")]}, "br")
+    assert not accepts({"headers": [(b"accept-encoding", b"gzip, br;q=0")]}, "br")
+    assert not accepts({"headers": []}, "br")
+
+
+def test_compresses_body():
+    app = application([b"<ruby>" * 100])
+    headers, bodies = request(app)
+
+    assert headers[b"content-encoding"] == b"br"
+    assert headers[b"content-length"] == str(len(bodies[0])).encode()
+    assert brotli.decompress(bodies[0]) == b"<ruby>" * 100
+    # GZip inside isn't asked to compress it again
+    assert app.scope["headers"] == []
+
+
+def test_compresses_stream_chunk_by_chunk():
+    headers, bodies = request(application([b"<ruby>" * 10, b"<rt>" * 10, b""]))
+
+    assert headers[b"content-encoding"] == b"br"
+    assert b"content-length" not in headers
+    decompressor = brotli.Decompressor()
+    # Each chunk is readable as soon as it arrives
+    assert decompressor.process(bodies[0]) == b"<ruby>" * 10
+    assert decompressor.process(bodies[1]) == b"<rt>" * 10
+
+
+def test_leaves_small_and_unaccepted():
+    assert request(application([b"small"]))[1] == [b"small"]
+    assert request(application([b"<ruby>" * 100]), b"gzip")[1] == [b"<ruby>" * 100]
+    assert request(application([b"x" * 100], [(b"content-encoding", b"gzip")]))[1] == [b"x" * 100]
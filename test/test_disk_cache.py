@@ -0,0 +1,63 @@
+import time
+
+from usecases import disk_cache, executor
+from usecases.cache import CACHES
+from usecases.disk_cache import DiskCache
+
+
+def test_shared_between_connections(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    first = DiskCache(path, name="test.disk.first")
+    second = DiskCache(path, name="test.disk.second")
+
+    first.set("english", "1", "key", "<ruby>")
+
+    assert second.get("english", "1", "key") == "<ruby>"
+    assert second.get("japanese", "1", "key") is None
+    assert second.cache_info() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1, "maxsize": 100_000}
+    assert CACHES["test.disk.second"] is second
+
+
+def test_version(tmp_path):
+    cache = DiskCache(str(tmp_path / "results.sqlite3"), name="test.disk.version")
+    cache.set("english", "1", "a", "old")
+    cache.set("japanese", "1", "a", "other language")
+
+    assert cache.get("english", "2", "a") is None
+    assert cache.invalidate("english", "2") == 1
+    assert cache.get("japanese", "1", "a") == "other language"
+
+
+def test_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path / "results.sqlite3"), ttl=0.01, name="test.disk.ttl")
+    cache.set("english", "1", "a", "expired")
+    time.sleep(0.02)
+
+    assert cache.get("english", "1", "a") is None
+    cache.purge()
+    assert len(cache) == 0
+
+
+def test_max_entries(tmp_path):
+    cache = DiskCache(str(tmp_path / "results.sqlite3"), max_entries=2, name="test.disk.max")
+    for key in ("a", "b", "c"):
+        cache.set("english", "1", key, key)
+    cache.purge()
+
+    assert len(cache) == 2
+    assert cache.get("english", "1", "a") is None
+    assert cache.get("english", "1", "c") == "c"
+    assert cache.evictions == 1
+
+
+def test_convert_reuses_results(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path / "results.sqlite3"), name="test.disk.convert")
+    monkeypatch.setattr(disk_cache, "instance", lambda: cache)
+    executor.stored_version.cache_clear()
+
+    html = executor.convert("english", "stored on the disk")
+    executor.engine("english").html_cache.clear()
+
+    assert executor.convert("english", "stored on the disk") == html
+    assert cache.hits == 1
+    executor.stored_version.cache_clear()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from usecases.english.ipa_phonetics import IPA
+from usecases.executor import ConversionExecutor, Saturated, warm_up
+
+
+def test_convert():
+    executor = ConversionExecutor("thread", max_workers=2, max_queue=2)
+
+    actual = asyncio.run(executor.convert("english", "This is a pen."))
+    assert actual == IPA().export_html("This is a pen.")
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_saturated():
+    executor = ConversionExecutor("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(executor.submit(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Saturated):
+            await executor.submit(release.wait)
+        release.set()
+        return await asyncio.gather(*blocked)
+
+    assert asyncio.run(run()) == [True, True]
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        ConversionExecutor("fiber")
+
+
+def test_warm_up():
+    seconds = warm_up(("english",))
+    assert list(seconds) == ["english"]
+    assert seconds["english"] >= 0
+
+
+def test_coalesces_same_text():
+    executor = ConversionExecutor("thread", max_workers=2, max_queue=2)
+    coalesced = executor.coalesced
+
+    async def run():
+        return await asyncio.gather(*(executor.convert("english", "The same passage.\n") for _ in range(10)),
+                                    executor.convert("english", "The same passage.\r\n"),
+                                    executor.convert("english", "Another passage."))
+
+    actual = asyncio.run(run())
+    assert actual[:11] == [IPA().export_html("The same passage.\n")] * 11
+    assert actual[11] == IPA().export_html("Another passage.")
+    assert executor.coalesced == coalesced + 10
+    assert executor._in_flight == dict()
+    executor.shutdown()
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from controllers.input import client_ip, escape_tags, split_chunks, split_sentences
+
+
+@pytest.mark.parametrize("text, max_characters, expected", [
+    ("I read it. The apple is red!\nLine two.", 100,
+     [("I read it. The apple is red!", True), ("Line two.", False)]),
+    ("I read it. The apple is red!", 15,
+     [("I read it. ", False), ("The apple is ", False), ("red!", False)]),
+    ("東京へ行った。はい。\n\nいいえ", 7,
+     [("東京へ行った。", False), ("はい。", True), ("", True), ("いいえ", False)]),
+    ("3.14 is pi.\n", 100, [("3.14 is pi.", False)]),
+    ("aaaaaaaaaaaa bb", 5, [("aaaaa", False), ("aaaaa", False), ("aa bb", False)]),
+])
+def test_split_chunks(text, max_characters, expected):
+    actual = list(split_chunks(text, max_characters))
+    assert actual == expected
+    assert "".join(chunk for chunk, _ in actual) == "".join(text.splitlines())
+
+
+def test_split_sentences():
+    assert split_sentences("I read it. The apple!\n\n東京へ行った。はい") == [
+        ("I read it. ", False), ("The apple!", True), ("", True), ("東京へ行った。", False), ("はい", False)]
+    assert split_sentences("") == []
+
+
+def test_escape_tags():
+    assert escape_tags("<script>x</script> a > b") == "&ltscript&gtx&lt/script&gt a &gt b"
+
+
+def connection(peer, forwarded=None):
+    headers = {"X-Forwarded-For": forwarded} if forwarded is not None else {}
+    return SimpleNamespace(headers=headers, client=SimpleNamespace(host=peer))
+
+
+def test_client_ip_ignores_a_spoofed_header():
+    # Without a proxy, anyone can write X-Forwarded-For; the client is the peer
+    assert client_ip(connection("203.0.113.7", "10.0.0.1")) == "203.0.113.7"
+    assert client_ip(SimpleNamespace(headers={}, client=None)) == ""
+
+
+@pytest.mark.parametrize("forwarded, trusted_proxies, expected", [
+    # The proxy appended the address of the client to the spoofed one
+    ("10.0.0.1, 203.0.113.7", 1, "203.0.113.7"),
+    ("203.0.113.7", 1, "203.0.113.7"),
+    ("10.0.0.1, 203.0.113.7, 192.168.0.2", 2, "203.0.113.7"),
+    # Fewer hops than proxies, the left-most one is the nearest to the client
+    ("203.0.113.7", 2, "203.0.113.7"),
+    ("", 1, "192.168.0.1"),
+])
+def test_client_ip_behind_trusted_proxies(forwarded, trusted_proxies, expected):
+    assert client_ip(connection("192.168.0.1", forwarded), trusted_proxies) == expected
@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from usecases.log import SEQUENCE_BITS, LogEntry, LogIds, Logs, MemoryBackend, SQLiteBackend, export, open_logs
+
+
+class BrokenBackend(MemoryBackend):
+    """The database is never reachable."""
+
+    def write(self, entries):
+        raise ConnectionError("database is down")
+
+
+def test_flush_in_batches():
+    backend = MemoryBackend()
+    logs = Logs(backend, batch_size=2, flush_interval=60)
+    for i in range(5):
+        logs.create(f"text {i}", f"html {i}", "127.0.0.1")
+    logs.close()
+
+    assert [entry.origin for entry in backend.entries] == [f"text {i}" for i in range(5)]
+    assert logs.stats() == {"buffered": 0, "written": 5, "dropped": 0, "failed": 0}
+
+
+def test_drop_when_full():
+    logs = Logs(MemoryBackend(), max_queue=2, batch_size=10, flush_interval=60, overflow="drop")
+    for i in range(3):
+        logs.create(f"text {i}", "", "")
+    assert [entry.origin for entry in logs._buffer] == ["text 0", "text 1"]
+    assert logs.dropped == 1
+    logs.close()
+
+
+def test_evict_when_full():
+    logs = Logs(MemoryBackend(), max_queue=2, batch_size=10, flush_interval=60, overflow="evict")
+    for i in range(3):
+        logs.create(f"text {i}", "", "")
+    assert [entry.origin for entry in logs._buffer] == ["text 1", "text 2"]
+    assert logs.dropped == 1
+    logs.close()
+
+
+def test_failures_are_counted():
+    logs = Logs(BrokenBackend(), flush_interval=60)
+    logs.create("text", "html", "")
+    logs.close()
+    assert logs.failed == 1
+
+
+def test_sqlite_backend():
+    backend = SQLiteBackend()
+    logs = Logs(backend, flush_interval=60)
+    logs.create("It's a pen'); DROP TABLE language_helper_logs; --", "html", "127.0.0.1")
+    logs.flush()
+
+    (row_id,) = backend._conn.execute("SELECT id FROM language_helper_logs").fetchone()
+    entry = logs.read_id(row_id)
+    assert entry.origin == "It's a pen'); DROP TABLE language_helper_logs; --"
+    assert entry.ip == "127.0.0.1"
+    logs.close()
+
+
+def test_open_logs():
+    settings = {"BACKEND": "memory", "MEMORY_ENTRIES": 10, "MAX_QUEUE": 10, "BATCH_SIZE": 5,
+                "FLUSH_INTERVAL": 1.0, "OVERFLOW": "drop"}
+    logs = open_logs(settings)
+    assert isinstance(logs.backend, MemoryBackend)
+    logs.close()
+
+    assert open_logs({**settings, "BACKEND": "none"}) is None
+    with pytest.raises(ValueError):
+        open_logs({**settings, "BACKEND": "mongodb"})
+
+
+def test_ids_are_unique_and_ordered():
+    ids = LogIds(node=3)
+    made = [ids.next(1_700_000_000.0) for _ in range((1 << SEQUENCE_BITS) + 10)]
+    # The clock going back
+    made.append(ids.next(1_600_000_000.0))
+    made.append(ids.next(1_700_000_001.0))
+    assert made == sorted(made)
+    assert len(set(made)) == len(made)
+    assert made[-1] < 2 ** 63
+
+
+def sqlite_logs(entries):
+    backend = SQLiteBackend()
+    backend.write(entries)
+    return Logs(backend, flush_interval=60)
+
+
+def entries_of(count):
+    start = datetime(2026, 1, 1)
+    return [LogEntry(i + 1, start + timedelta(minutes=i), f"text {i}", f"html {i}", "127.0.0.1",
+                     "japanese" if i % 2 else "english") for i in range(count)]
+
+
+@pytest.mark.parametrize("backend", (SQLiteBackend, MemoryBackend))
+def test_keyset_pages(backend):
+    logs = Logs(backend(), flush_interval=60)
+    logs.backend.write(entries_of(7))
+
+    pages = list()
+    after = None
+    while True:
+        page = logs.page(after, limit=2, language="japanese", since=datetime(2026, 1, 1, 0, 2))
+        pages.append([entry.origin for entry in page])
+        if len(page) < 2:
+            break
+        after = page[-1].id
+    assert pages == [["text 3", "text 5"], []]
+    logs.close()
+
+
+def test_language_is_logged():
+    logs = Logs(SQLiteBackend(), flush_interval=60)
+    logs.create("漢字", "html", "127.0.0.1", "japanese")
+    logs.create("pen", "html", "127.0.0.1", "english")
+    logs.flush()
+    assert [entry.origin for entry in logs.page(language="english")] == ["pen"]
+    logs.close()
+
+
+def test_queries_use_the_indexes():
+    backend = SQLiteBackend()
+    plan = " ".join(row[-1] for row in backend._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM language_helper_logs WHERE id > 1 AND language = 'english' "
+        "ORDER BY id LIMIT 10"))
+    assert "language_helper_logs_language_id" in plan
+    plan = " ".join(row[-1] for row in backend._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM language_helper_logs WHERE created_at >= '2026-01-01'"))
+    assert "language_helper_logs_created_at" in plan
+
+
+def test_former_table_is_migrated(tmp_path):
+    path = str(tmp_path / "logs.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE language_helper_logs (id INTEGER, created_at TIMESTAMP, "
+                     "origin TEXT, phonetics TEXT, ip TEXT)")
+        # The former ids were hashes of the time, in no order and shared by the logs of the same time
+        conn.executemany("INSERT INTO language_helper_logs VALUES (?, ?, ?, 'html', '')",
+                         [(5, "2021-01-02 00:00:00", "second"), (-7, "2021-01-03 00:00:00", "third"),
+                          (5, "2021-01-02 00:00:00", "second again"), (9, "2020-12-31 00:00:00", "first")])
+    conn.close()
+
+    backend = SQLiteBackend(path)
+    backend.write([LogEntry(LogIds(backend.node).next(datetime.now().timestamp()),
+                            datetime.now(), "new", "html", "", "english")])
+    entries = backend.page()
+    assert [entry.origin for entry in entries] == ["first", "second", "second again", "third", "new"]
+    assert [entry.language for entry in entries] == ["", "", "", "", "english"]
+    assert len({entry.id for entry in entries}) == 5
+    backend.close()
+
+    # The migrated table isn't migrated again
+    assert [entry.origin for entry in SQLiteBackend(path).page()] == [entry.origin for entry in entries]
+
+
+def test_nodes_are_handed_out_by_the_database(tmp_path):
+    path = str(tmp_path / "logs.sqlite3")
+    nodes = [SQLiteBackend(path).node for _ in range(3)]
+    assert len(set(nodes)) == 3
+
+
+@pytest.mark.parametrize("output_format", ("jsonl", "csv"))
+def test_export_streams_every_page(output_format):
+    logs = sqlite_logs(entries_of(5))
+    f = io.StringIO()
+    assert logs.export(f, output_format, batch_size=2) == 5
+
+    f.seek(0)
+    if output_format == "jsonl":
+        records = [json.loads(line) for line in f]
+    else:
+        records = list(csv.DictReader(f))
+    assert [record["origin"] for record in records] == [f"text {i}" for i in range(5)]
+    assert records[0]["created_at"] == "2026-01-01T00:00:00"
+    logs.close()
+
+
+def test_export_format():
+    with pytest.raises(ValueError):
+        export([], io.StringIO(), "xml")
+
+
+def test_memory_backend_is_bounded_and_ordered():
+    backend = MemoryBackend(max_entries=3)
+    entries = entries_of(5)
+    backend.write([entries[1], entries[0], entries[3]])
+    backend.write([entries[2], entries[4]])
+
+    assert [entry.origin for entry in backend.page()] == ["text 2", "text 3", "text 4"]
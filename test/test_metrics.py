@@ -0,0 +1,52 @@
+from usecases import metrics
+from usecases.english.ipa_phonetics import IPA
+
+
+def test_histogram():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.1, "a")
+    histogram.observe(5.0, "a")
+
+    assert histogram.count("a") == 3
+    assert list(histogram.samples()) == [
+        'language_helper_test_seconds_bucket{stage="a",le="0.1"} 2',
+        'language_helper_test_seconds_bucket{stage="a",le="1.0"} 2',
+        'language_helper_test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'language_helper_test_seconds_sum{stage="a"} 5.15',
+        'language_helper_test_seconds_count{stage="a"} 3',
+    ]
+
+
+def test_counter():
+    counter = metrics.Counter("test_total", "Test.", ("language",))
+    counter.inc("japanese")
+    counter.inc("japanese", amount=2)
+
+    assert counter.value("japanese") == 3
+    assert list(counter.samples()) == ['language_helper_test_total{language="japanese"} 3']
+
+
+def test_labels_escaped():
+    assert metrics._labels(("path",), ('a"b\\',)) == '{path="a\\"b\\\\"}'
+
+
+def test_export_html():
+    stages = metrics.STAGE_SECONDS.count("english", "render")
+    tokens = metrics.TOKENS.value("english")
+    oov = metrics.OOV.value("english")
+
+    IPA().export_html("metrics qwzxv")
+
+    assert metrics.STAGE_SECONDS.count("english", "render") == stages + 1
+    assert metrics.TOKENS.value("english") == tokens + 2
+    assert metrics.OOV.value("english") == oov + 1
+
+
+def test_render():
+    IPA().export_html("render")
+    text = metrics.render()
+
+    assert "# TYPE language_helper_stage_seconds histogram" in text
+    assert 'language_helper_stage_seconds_count{language="english",stage="lookup"}' in text
+    assert 'language_helper_cache_misses_total{cache="english.html"}' in text
@@ -0,0 +1,41 @@
+import asyncio
+
+from usecases.english.ipa_phonetics import IPA
+from usecases.executor import ConversionExecutor
+from usecases.mixed import segment, stitch_html, stitch_tokens
+
+
+def test_segment():
+    text = "樹木希林は FUJI カラーで2021年に\r\nI read it."
+
+    assert [(kind, text[start:end]) for kind, start, end in segment(text)] == [
+        ("japanese", "樹木希林は "),
+        ("english", "FUJI"),
+        ("plain", " "),
+        ("japanese", "カラーで2021年に"),
+        ("breaks", "\r\n"),
+        ("english", "I read it."),
+    ]
+    assert segment("") == []
+
+
+def test_stitch():
+    text = "漢字 and かな\n\nend"
+    spans = segment(text)
+    converted = {"japanese": ["<ruby>漢字</ruby> "], "english": ["<i>and</i> ", "<i>end</i> "]}
+
+    assert stitch_html(text, spans, converted) == "<ruby>漢字</ruby> <i>and</i> かな<br>\n<br>\n<i>end</i>"
+    tokens = {"japanese": [[("漢字", "かんじ", 0, 2)]], "english": [[("and", "ænd", 0, 3)], [("end", "ɛnd", 0, 3)]]}
+    assert stitch_tokens(spans, tokens) == [("漢字", "かんじ", 0, 2), ("and", "ænd", 3, 6), ("end", "ɛnd", 11, 14)]
+
+
+def test_convert_mixed_without_kanji():
+    # Without kanji, Furigana isn't used at all
+    executor = ConversionExecutor("thread", max_workers=2, max_queue=2)
+    text = "これは pen です"
+
+    html = asyncio.run(executor.convert_mixed(text))
+    assert html == f"これは {IPA().export_html('pen').rstrip(' ')} です"
+    tokens = asyncio.run(executor.convert_mixed(text, output="tokens"))
+    assert tokens == [("pen", IPA().dict_data["pen"], 4, 7)]
+    executor.shutdown()
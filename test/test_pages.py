@@ -0,0 +1,29 @@
+from presenters.pages import Page, static_pages
+
+
+def test_is_not_modified():
+    page = Page(b"<html></html>", "text/html; charset=utf-8", 1_600_000_000.5)
+
+    assert not page.is_not_modified({})
+    assert page.is_not_modified({"if-none-match": page.etag})
+    assert page.is_not_modified({"if-none-match": f'"other", W/{page.etag}'})
+    assert not page.is_not_modified({"if-none-match": '"other"'})
+    assert page.is_not_modified({"if-modified-since": page.last_modified})
+    assert not page.is_not_modified({"if-modified-since": "Thu, 01 Jan 2015 00:00:00 GMT"})
+    assert not page.is_not_modified({"if-modified-since": "yesterday"})
+    # If-None-Match wins over If-Modified-Since
+    assert not page.is_not_modified({"if-none-match": '"other"', "if-modified-since": page.last_modified})
+
+
+def test_etag_depends_on_content():
+    assert Page(b"a", "text/plain", 0).etag == Page(b"a", "text/plain", 1).etag
+    assert Page(b"a", "text/plain", 0).etag != Page(b"b", "text/plain", 0).etag
+
+
+def test_static_pages():
+    pages = static_pages("static")
+
+    assert pages["/static/css/basic.css"].content_type == "text/css; charset=utf-8"
+    with open("static/js/prism.js", mode="rb") as f:
+        assert pages["/static/js/prism.js"].body == f.read()
+    assert not any(path.startswith("/static/templates/") for path in pages)
@@ -0,0 +1,32 @@
+import time
+
+from usecases import metrics
+from usecases.profiler import SlowProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_reports_slow(capsys):
+    profiler = SlowProfiler(threshold=0.05, interval=0.001)
+    slow = metrics.SLOW.value("english")
+
+    with profiler.profile("english", 10):
+        busy(0.1)
+
+    output = capsys.readouterr().out
+    assert output.startswith("Slow conversion of english:")
+    assert "busy" in output
+    assert metrics.SLOW.value("english") == slow + 1
+
+
+def test_ignores_fast(capsys):
+    profiler = SlowProfiler(threshold=1.0, interval=0.001)
+
+    with profiler.profile("english", 10):
+        busy(0.01)
+
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from usecases.session import EditSession, Sessions, SessionFull
+
+
+class FakeRender:
+    def __init__(self) -> None:
+        self.rendered: list[str] = list()
+
+    async def __call__(self, sentence: str, has_break: bool) -> str:
+        self.rendered.append(sentence)
+        return f"<{sentence}>" + ("<br>" if has_break else "")
+
+
+def apply_changes(fragments: list[str], changes: list[dict]) -> list[str]:
+    fragments = list(fragments)
+    for change in changes:
+        fragments[change["start"]:change["start"] + change["delete"]] = change["insert"]
+    return fragments
+
+
+def test_update_renders_only_changed_sentences():
+    render = FakeRender()
+    session = EditSession(render)
+
+    first = asyncio.run(session.update("今日は晴れ。明日は雨。\n明後日は雪。"))
+    fragments = apply_changes(list(), first)
+    assert fragments == ["<今日は晴れ。>", "<明日は雨。><br>", "<明後日は雪。>"]
+    assert session.version == 1
+
+    render.rendered.clear()
+    second = asyncio.run(session.update("今日は晴れ。明日は曇り。\n明後日は雪。"))
+    assert render.rendered == ["明日は曇り。"]
+    assert apply_changes(fragments, second) == ["<今日は晴れ。>", "<明日は曇り。><br>", "<明後日は雪。>"]
+    assert session.version == 2
+
+
+def test_apply_edit():
+    session = EditSession(FakeRender())
+    asyncio.run(session.update(session.apply({"text": "This is a pen."})))
+
+    assert session.apply({"edit": {"start": 10, "end": 13, "text": "book"}}) == "This is a book."
+    with pytest.raises(ValueError):
+        session.apply({"edit": {"start": 10, "end": 99, "text": "book"}})
+    with pytest.raises(ValueError):
+        session.apply({"delete": 1})
+
+
+def test_limits():
+    session = EditSession(FakeRender(), max_characters=5)
+    with pytest.raises(SessionFull):
+        asyncio.run(session.update("This is a pen."))
+    assert session.version == 0
+
+    sessions = Sessions(max_sessions=1)
+    opened = sessions.open(FakeRender(), 100)
+    with pytest.raises(SessionFull):
+        sessions.open(FakeRender(), 100)
+    sessions.close(opened)
+    sessions.open(FakeRender(), 100)
+    assert sessions.active == 1
@@ -0,0 +1,113 @@
+import os
+
+from usecases.english.ipa_phonetics import IPA
+from usecases.user_dict import ReloadingDictionary, UserDictionary, build, english_key, katakana, read_source
+
+
+def write_source(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_match_longest(tmp_path):
+    source = write_source(tmp_path / "names.tsv", ["# name\treading", "樹木\tじゅもく", "樹木希林\tきききりん", "希林\tキリン"])
+    path = str(tmp_path / "names.dic")
+    assert build(read_source(source, "japanese"), path) == 3
+
+    dictionary = UserDictionary(path)
+    assert dictionary.match("樹木希林は樹木と希林") == [
+        (0, 4, "キキキリン"), (5, 7, "ジュモク"), (8, 10, "キリン"),
+    ]
+    assert dictionary.match("ひらがな") == []
+
+
+def test_match_words(tmp_path):
+    source = write_source(tmp_path / "terms.tsv", ["New York\tnuː jɔːrk", "new\tnuː", "york city hall\tx"])
+    path = str(tmp_path / "terms.dic")
+    build(read_source(source, "english"), path)
+
+    dictionary = UserDictionary(path)
+    assert dictionary.match_words(["in", "new", "york", "city"]) == [(1, 3, "nuː jɔːrk")]
+    # Only whole words match
+    assert dictionary.match_words(["newyork", "news"]) == []
+
+
+def test_empty(tmp_path):
+    path = str(tmp_path / "empty.dic")
+    build(dict(), path)
+    assert UserDictionary(path).match("樹木") == []
+
+
+def test_katakana():
+    assert katakana("きききりんとカタカナ") == "キキキリントカタカナ"
+
+
+def test_reload(tmp_path):
+    path = str(tmp_path / "names.dic")
+    reloads = list()
+    dictionary = ReloadingDictionary(path, interval=0, on_reload=lambda: reloads.append(True))
+    assert dictionary.current() is None
+    assert dictionary.version == "user=none"
+
+    build({"樹木".encode(): "ジュモク"}, path)
+    assert dictionary.current().match("樹木") == [(0, 2, "ジュモク")]
+    version = dictionary.version
+
+    build({"樹木".encode(): "ジュモク", "希林".encode(): "キリン"}, path)
+    assert dictionary.current().match("希林") == [(0, 2, "キリン")]
+    assert dictionary.version != version
+    assert reloads == [True, True]
+
+    # A broken file keeps the former words
+    with open(f"{path}.tmp", mode="wb") as f:
+        f.write(b"broken!!" + bytes(12))
+    os.replace(f"{path}.tmp", path)
+    assert dictionary.current().match("希林") == [(0, 2, "キリン")]
+    os.remove(path)
+
+
+def test_ipa_reads_user_dictionary(tmp_path, monkeypatch):
+    source = write_source(tmp_path / "terms.tsv", ["New York\tnuː jɔːrk", "ginza\tɡɪnzə"])
+    path = str(tmp_path / "terms.dic")
+    build(read_source(source, "english"), path)
+
+    phonetic = IPA()
+    monkeypatch.setattr(IPA, "user_dict", ReloadingDictionary(path, interval=0))
+    text = "I saw GiNZA in New  York."
+
+    actual = phonetic.export_tokens(text)
+    assert ("GiNZA", "ɡɪnzə", 6, 11) in actual
+    assert actual[-1] == ("New  York.", "nuː jɔːrk", 15, 25)
+    assert phonetic._fetch_phonetics([text])[-1] == ("New York.", "nuː jɔːrk")
+    # A phrase doesn't go over a line break
+    assert ("New<br>", phonetic.dict_data["new"]) in phonetic._fetch_phonetics(["New<br>\nYork"])
+
+
+def test_english_surfaces_are_looked_up_as_ipa(tmp_path, monkeypatch):
+    source = write_source(tmp_path / "terms.tsv", ["Wi-Fi\twaɪfaɪ", "e-mail address\tiːmeɪl ədrɛs", "--\tnothing"])
+    path = str(tmp_path / "terms.dic")
+    words = read_source(source, "english")
+    assert list(words) == [b"wifi", b"email address"]
+    build(words, path)
+
+    monkeypatch.setattr(IPA, "user_dict", ReloadingDictionary(path, interval=0))
+    phonetic = IPA()
+    assert phonetic._fetch_phonetics(["I use Wi-Fi"])[-1] == ("Wi-Fi", "waɪfaɪ")
+    assert phonetic._fetch_phonetics(["My E-mail address."])[-1] == ("E-mail address.", "iːmeɪl ədrɛs")
+    assert english_key("Don't!") == "don't"
+
+
+def test_ipa_html_follows_a_rebuilt_dictionary(tmp_path, monkeypatch):
+    source = write_source(tmp_path / "terms.tsv", ["ginza\tɡɪnzə"])
+    path = str(tmp_path / "terms.dic")
+    build(read_source(source, "english"), path)
+
+    phonetic = IPA()
+    monkeypatch.setattr(IPA, "user_dict", ReloadingDictionary(path, interval=0, on_reload=IPA.html_cache.clear))
+    text = "I shopped in Ginza."
+    assert "ɡɪnzə" in phonetic.export_html(text)
+
+    source = write_source(tmp_path / "terms.tsv", ["ginza\tɡiːnzɑː"])
+    build(read_source(source, "english"), path)
+    # The HTML cached with the former words isn't served
+    assert "ɡiːnzɑː" in phonetic.export_html(text)
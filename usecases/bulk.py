@@ -0,0 +1,232 @@
+"""
+Convert large corpora without the server.
+
+    $ python -m usecases.bulk japanese corpus.txt --output corpus.html
+    $ cat corpus.jsonl | python -m usecases.bulk english - --input-format jsonl --field text > corpus.out.jsonl
+    $ python -m usecases.bulk japanese corpus.txt --output corpus.html --resume
+
+Every line of a text file, or every record of a JSONL file, is converted without the limit of
+the characters. The records are sent to the workers in chunks; each worker loads the model once.
+The results are written in the order of the input while the next chunks are converted.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, Optional, TextIO
+
+from usecases.executor import engine, warm_up
+
+
+def read_records(paths: list[str], input_format: str, field: str) -> Iterator[tuple[Optional[dict], str]]:
+    """
+    Records of the files in order. "-" is the standard input.
+
+    Args:
+        paths(list[str]): Files to read
+        input_format(str): "text" or "jsonl"
+        field(str): Field of the text in a JSONL record
+
+    Yields:
+        tuple[Optional[dict], str]: (record or None for text, text to convert)
+    """
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, mode="r", encoding="utf-8")
+        try:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if input_format == "jsonl":
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    yield record, record[field]
+                else:
+                    yield None, line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def chunked(records: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(records)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def convert_chunk(language: str, output_format: str, texts: list[str], batch_size: int = 64) -> list:
+    """
+    Convert the texts of a chunk. This runs inside the workers.
+
+    Args:
+        language(str): "japanese" or "english"
+        output_format(str): "html" or "tokens"
+        texts(list[str]): Texts of the chunk
+        batch_size(int): Number of texts in a batch of spaCy
+
+    Returns:
+        list: HTML or tokens of each text
+    """
+    converter = engine(language)
+    if output_format == "tokens":
+        return [converter.export_tokens(text) for text in texts]
+    if language == "japanese":
+        return converter.export_html_many(texts, batch_size=batch_size)
+    return [converter.export_html(text) for text in texts]
+
+
+class Checkpoint:
+    """Number of the records written and the size of the output at that time."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> tuple[int, int]:
+        """(records, bytes) written, or (0, 0) without a checkpoint"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0, 0
+        return saved["records"], saved["bytes"]
+
+    def save(self, records: int, size: int) -> None:
+        # Written to a temporary file and renamed, so a crash never leaves half of it
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump({"records": records, "bytes": size}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """Records and characters per second, reported to stderr"""
+
+    def __init__(self, enabled: bool, interval: float = 1.0, stream: TextIO = sys.stderr) -> None:
+        self.enabled = enabled
+        self.interval = interval
+        self.stream = stream
+        self.records = 0
+        self.characters = 0
+        self.started = time.perf_counter()
+        self._reported = self.started
+
+    def add(self, records: int, characters: int) -> None:
+        self.records += records
+        self.characters += characters
+        now = time.perf_counter()
+        if self.enabled and now - self._reported >= self.interval:
+            self._reported = now
+            self.report()
+
+    def report(self, end: str = "\r") -> None:
+        if not self.enabled:
+            return
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        print(f"{self.records} records, {self.records / seconds:.1f} records/s, "
+              f"{self.characters / seconds:.0f} characters/s", end=end, file=self.stream, flush=True)
+
+
+def output_line(record: Optional[dict], result, output_format: str, output_field: str) -> str:
+    """A line of the output: the record with the result for JSONL, otherwise the result"""
+    if record is not None:
+        return json.dumps({**record, output_field: result}, ensure_ascii=False) + "\n"
+    elif output_format == "tokens":
+        return json.dumps(result, ensure_ascii=False) + "\n"
+    return result + "\n"
+
+
+def run(args: argparse.Namespace) -> int:
+    """
+    Convert the inputs as the arguments tell.
+
+    Returns:
+        (int) Number of the records written by this run
+    """
+    checkpoint = Checkpoint(f"{args.output}.checkpoint") if args.output else None
+    skip, size = checkpoint.load() if checkpoint is not None and args.resume else (0, 0)
+
+    out: BinaryIO
+    if args.output:
+        out = open(args.output, mode="r+b" if skip else "wb")
+        # The results written after the last checkpoint are written again
+        out.truncate(size)
+        out.seek(size)
+    else:
+        out = sys.stdout.buffer
+
+    records = itertools.islice(read_records(args.inputs, args.input_format, args.field), skip, None)
+    chunks = chunked(records, args.chunk_size)
+    progress = Progress(args.progress)
+    written = skip
+
+    pool: Optional[ProcessPoolExecutor] = None
+    if args.workers > 0:
+        pool = ProcessPoolExecutor(args.workers, initializer=warm_up, initargs=((args.language,),))
+    try:
+        # Bounded number of chunks in flight, so the memory doesn't grow with the corpus
+        in_flight: deque[tuple[list, Future]] = deque()
+        for chunk in itertools.chain(chunks, [None]):
+            if chunk is not None:
+                texts = [text for _, text in chunk]
+                if pool is None:
+                    future: Future = Future()
+                    future.set_result(convert_chunk(args.language, args.format, texts, args.batch_size))
+                else:
+                    future = pool.submit(convert_chunk, args.language, args.format, texts, args.batch_size)
+                in_flight.append((chunk, future))
+
+            while in_flight and (chunk is None or len(in_flight) >= args.max_pending):
+                done, future = in_flight.popleft()
+                out.write("".join(output_line(record, result, args.format, args.output_field)
+                                  for (record, _), result in zip(done, future.result())).encode("utf-8"))
+                out.flush()
+                written += len(done)
+                progress.add(len(done), sum(len(text) for _, text in done))
+                if checkpoint is not None:
+                    checkpoint.save(written, out.tell())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    progress.report(end="\n")
+    if checkpoint is not None:
+        checkpoint.remove()
+    return written - skip
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("language", choices=["japanese", "english"])
+    parser.add_argument("inputs", nargs="+", help='files to convert, "-" for the standard input')
+    parser.add_argument("--output", help="file to write; the standard output when it is omitted")
+    parser.add_argument("--input-format", choices=["text", "jsonl"], default="text")
+    parser.add_argument("--field", default="text", help="field of the text in a JSONL record")
+    parser.add_argument("--format", choices=["html", "tokens"], default="html")
+    parser.add_argument("--output-field", default="html", help="field of the result in a JSONL record")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes converting the chunks, 0 to convert in this process")
+    parser.add_argument("--chunk-size", type=int, default=256, help="records sent to a worker at once")
+    parser.add_argument("--max-pending", type=int, default=None, help="chunks in flight, twice the workers by default")
+    parser.add_argument("--batch-size", type=int, default=64, help="texts in a batch of spaCy")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of the output")
+    parser.add_argument("--progress", action="store_true", help="report the progress to stderr")
+    args = parser.parse_args(argv)
+
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+    if args.max_pending is None:
+        args.max_pending = max(2 * args.workers, 1)
+    return args
+
+
+if __name__ == "__main__":
+    run(parse_args())
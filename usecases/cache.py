@@ -0,0 +1,83 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# name: cache, to report the counters of every cache
+CACHES: dict[str, "LRUCache"] = dict()
+
+
+class LRUCache:
+    """Size limited cache which evicts the least recently used entry."""
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        """
+        Args:
+            name(str): Name to report the counters, e.g. "japanese.words"
+            maxsize(int): Number of entries kept. 0 disables the cache.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value, or None on a miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def cache_info(self) -> dict[str, int]:
+        """Counters to size the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Counters of every cache"""
+    return {name: cache.cache_info() for name, cache in CACHES.items()}
+
+
+def normalize(text: str) -> str:
+    """
+    The text as the engines read it. The line breaks are unified to "<br>\\n",
+    so texts which differ only in line breaks share the same HTML.
+    """
+    return "<br>\n".join(text.splitlines())
+
+
+def text_key(text: str) -> str:
+    """Key of the whole normalized input for the cache of the final HTML."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from config.loader import load_settings
+from usecases.cache import CACHES
+
+TABLE = "results"
+# Bump when the HTML written by the engines changes, so the stored results are invalidated.
+FORMAT_VERSION = 1
+# The expired and surplus entries are deleted every this number of writes
+PURGE_EVERY = 1_000
+
+
+class DiskCache:
+    """
+    Converted HTML shared by every worker on the host and kept across restarts.
+
+    The results are stored in SQLite in WAL mode, so the readers never wait for the writer.
+    An entry is keyed by the language and the hash of the normalized text,
+    and it is only valid for the version of the engine which wrote it.
+    The oldest entries are deleted first; a hit doesn't refresh an entry, so reads never write.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 60 * 60, max_entries: int = 100_000,
+                 name: str = "disk") -> None:
+        """
+        Args:
+            path(str): File of SQLite
+            ttl(float): Seconds an entry is valid. 0 keeps the entries until they are evicted.
+            max_entries(int): Number of entries kept
+            name(str): Name to report the counters
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                               "language TEXT, key TEXT, version TEXT, html TEXT, created_at REAL, "
+                               "PRIMARY KEY (language, key))")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_created_at ON {TABLE} (created_at)")
+        CACHES[name] = self
+
+    def get(self, language: str, version: str, key: str) -> Optional[str]:
+        """The stored HTML, or None when it is missing, expired or written by another version."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT version, html, created_at FROM {TABLE} "
+                                     "WHERE language = ? AND key = ?", (language, key)).fetchone()
+            if row is None or row[0] != version or (self.ttl and row[2] + self.ttl < time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[1]
+
+    def set(self, language: str, version: str, key: str, html: str) -> None:
+        with self._lock:
+            self._conn.execute(f"INSERT OR REPLACE INTO {TABLE} VALUES (?, ?, ?, ?, ?)",
+                               (language, key, version, html, time.time()))
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self._purge()
+
+    def invalidate(self, language: str, version: str) -> int:
+        """
+        Delete the entries of the language written by the other versions of the engine.
+
+        Returns:
+            (int) Number of the deleted entries
+        """
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM {TABLE} WHERE language = ? AND version != ?",
+                                         (language, version)).rowcount
+            self.evictions += deleted
+            return deleted
+
+    def purge(self) -> None:
+        """Delete the expired entries and the oldest ones over max_entries."""
+        with self._lock:
+            self._purge()
+
+    def _purge(self) -> None:
+        if self.ttl:
+            self.evictions += self._conn.execute(f"DELETE FROM {TABLE} WHERE created_at < ?",
+                                                 (time.time() - self.ttl,)).rowcount
+        surplus = self._count() - self.max_entries
+        if surplus > 0:
+            self.evictions += self._conn.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {TABLE} ORDER BY created_at, rowid LIMIT ?)", (surplus,)).rowcount
+
+    def _count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def cache_info(self) -> dict[str, int]:
+        """Counters of this process, in the same keys as LRUCache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+            "maxsize": self.max_entries,
+        }
+
+
+@lru_cache(maxsize=None)
+def _open(pid: int) -> Optional[DiskCache]:
+    settings = load_settings()["CACHE"]
+    if not settings["DISK_PATH"]:
+        return None
+    return DiskCache(settings["DISK_PATH"], ttl=settings["DISK_TTL"], max_entries=settings["DISK_ENTRIES"])
+
+
+def instance() -> Optional[DiskCache]:
+    """
+    The disk cache of this process, or None when CACHE.DISK_PATH is empty.
+    A connection of SQLite can't be shared with a forked process, so each process opens its own.
+    """
+    return _open(os.getpid())
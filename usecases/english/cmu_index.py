@@ -0,0 +1,173 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Iterator, Mapping
+from typing import Optional
+
+DICT_DIR = './domains/english/dict'
+INDEX_PATH = f'{DICT_DIR}/cmudict.idx'
+SOURCES = ('cmudict', 'symbols', 'vowels')
+
+# The offsets table is written in native byte order, so the byte order is part of the magic.
+MAGIC = b'CMUIDX1' + (b'L' if sys.byteorder == 'little' else b'B')
+# magic, number of words, meta length, (size, mtime_ns) of each source file
+HEADER = struct.Struct('8sII' + 'QQ' * len(SOURCES))
+
+
+class CMUIndex(Mapping):
+    """
+    Read-only view of the compiled CMU dictionary.
+
+    The file is mapped into memory, so the pages are shared by every process
+    that opens it and nothing is parsed at start up.
+
+    Layout:
+        header | meta (JSON) | offsets (uint32 * (count + 1)) | records
+        record: word (UTF-8) + b"\\0" + IPA (UTF-8), sorted by word bytes.
+    """
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        with open(path, mode='rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, meta_length, *self.fingerprint = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a CMU dictionary index.")
+
+        meta_end = HEADER.size + meta_length
+        self.meta: dict = json.loads(self._mm[HEADER.size:meta_end].decode('utf-8'))
+        self.vowels: tuple[str, ...] = tuple(self.meta['vowels'])
+
+        offsets_end = meta_end + 4 * (self._count + 1)
+        self._offsets = memoryview(self._mm)[meta_end:offsets_end].cast('I')
+        self._records = offsets_end
+
+    def _key(self, i: int) -> bytes:
+        start = self._records + self._offsets[i]
+        return self._mm[start:self._mm.find(b'\0', start)]
+
+    def _find(self, key: bytes) -> Optional[int]:
+        """Binary search of the record holding the key."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return low
+        return None
+
+    def __getitem__(self, word: str) -> str:
+        key = word.encode('utf-8')
+        i = self._find(key)
+        if i is None:
+            raise KeyError(word)
+        start = self._records + self._offsets[i] + len(key) + 1
+        end = self._records + self._offsets[i + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self._find(word.encode('utf-8')) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key(i).decode('utf-8')
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def fingerprint(dict_dir: str = DICT_DIR) -> list[int]:
+    """Sizes and modification times of the source files."""
+    values: list[int] = list()
+    for name in SOURCES:
+        stat = os.stat(f'{dict_dir}/{name}')
+        values.extend((stat.st_size, stat.st_mtime_ns))
+    return values
+
+
+def build(dict_dir: str = DICT_DIR, path: str = INDEX_PATH) -> int:
+    """
+    Compile cmudict, symbols and vowels into the binary index.
+
+    Args:
+        dict_dir(str): Directory of the source files
+        path(str): Output path of the index
+
+    Returns:
+        (int) The number of words in the index
+    """
+    # symbols[i][0]: Alphabet
+    # symbols[i][1:]: IPA symbol
+    with open(f'{dict_dir}/symbols', mode='r', newline='', encoding='utf-8') as f:
+        symbols: dict[str, list[str]] = {row[0]: row[1:] for row in csv.reader(f, delimiter=' ')}
+
+    with open(f'{dict_dir}/vowels', mode='r', newline='', encoding='utf-8') as f:
+        vowels: list[str] = [row for row in csv.reader(f, delimiter=' ')][0]
+
+    # row[0]: word
+    # row[1:]: phonetics
+    words: dict[bytes, bytes] = dict()
+    with open(f'{dict_dir}/cmudict', mode='r', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter=' '):
+            ipa = "".join(symbols[alphabet][0] for alphabet in row[1:] if alphabet)
+            words[row[0].encode('utf-8')] = ipa.encode('utf-8')
+
+    offsets = array('I', [0])
+    records = bytearray()
+    for key in sorted(words):
+        records += key + b'\0' + words[key]
+        offsets.append(len(records))
+
+    meta = json.dumps({'vowels': vowels}, ensure_ascii=False).encode('utf-8')
+    header = HEADER.pack(MAGIC, len(words), len(meta), *fingerprint(dict_dir))
+
+    # Write to a temporary file and rename it, so other workers never see a half written index.
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, mode='wb') as f:
+        f.write(header)
+        f.write(meta)
+        f.write(offsets.tobytes())
+        f.write(records)
+    os.replace(tmp_path, path)
+
+    return len(words)
+
+
+def load(dict_dir: str = DICT_DIR, path: str = INDEX_PATH) -> CMUIndex:
+    """
+    Open the index, (re)building it when it is missing or older than the sources.
+
+    Args:
+        dict_dir(str): Directory of the source files
+        path(str): Path of the index
+
+    Returns:
+        (CMUIndex)
+    """
+    try:
+        index = CMUIndex(path)
+        if index.fingerprint == fingerprint(dict_dir):
+            return index
+    except (OSError, ValueError, struct.error):
+        pass
+
+    build(dict_dir, path)
+    return CMUIndex(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile the CMU dictionary into a binary index.")
+    parser.add_argument('--dict-dir', default=DICT_DIR)
+    parser.add_argument('--output', default=INDEX_PATH)
+    args = parser.parse_args()
+
+    count = build(args.dict_dir, args.output)
+    print(f"{count} words are written to {args.output}")
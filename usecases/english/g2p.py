@@ -0,0 +1,111 @@
+from collections.abc import Mapping
+from typing import Optional
+
+# Spellings and their IPA, in the unstressed symbols of `symbols`.
+# The longest spelling matching at a position is used.
+RULES: dict[str, str] = {
+    "tion": "ʃən", "sion": "ʒən", "igh": "aɪ", "tch": "ʧ",
+    "sh": "ʃ", "ch": "ʧ", "th": "θ", "ph": "f", "wh": "w", "ck": "k", "ng": "ŋ", "qu": "kw",
+    "ee": "iː", "ea": "iː", "oo": "u", "ou": "aʊ", "ow": "oʊ", "ai": "eɪ", "ay": "eɪ", "oa": "oʊ",
+    "oi": "ɔɪ", "oy": "ɔɪ", "au": "ɔ", "aw": "ɔ",
+    "er": "ɜːr", "ir": "ɜːr", "ur": "ɜːr", "ar": "ɑːr", "or": "ɔr",
+    "a": "æ", "e": "ɛ", "i": "ɪ", "o": "ɑː", "u": "ʌ",
+    "b": "b", "d": "d", "f": "f", "h": "h", "j": "ʤ", "k": "k", "l": "l", "m": "m", "n": "n",
+    "p": "p", "q": "k", "r": "r", "s": "s", "t": "t", "v": "v", "w": "w", "x": "ks", "z": "z",
+}
+LONGEST_RULE = max(len(spelling) for spelling in RULES)
+VOWEL_LETTERS = "aeiouy"
+# Words longer than this aren't split into sub-words, to bound the lookups
+MAX_SPLIT_LENGTH = 32
+
+
+def split_known(word: str, dictionary: Mapping, min_length: int = 2) -> Optional[list[str]]:
+    """
+    Split the word into the fewest words of the dictionary.
+
+    Args:
+        word(str): Lower case word, e.g. "newspaperthe"
+        dictionary(Mapping): word: IPA
+        min_length(int): Length of the shortest sub-word
+
+    Returns:
+        Optional[list[str]]: e.g. ["newspaper", "the"], or None when it can't be split
+    """
+    if len(word) > MAX_SPLIT_LENGTH:
+        return None
+
+    # best[i]: the fewest sub-words making word[:i]
+    best: list[Optional[list[str]]] = [None] * (len(word) + 1)
+    best[0] = list()
+    for end in range(min_length, len(word) + 1):
+        for start in range(end - min_length + 1):
+            if best[start] is None or (best[end] is not None and len(best[start]) + 1 >= len(best[end])):
+                continue
+            if word[start:end] in dictionary:
+                best[end] = best[start] + [word[start:end]]
+    pieces = best[-1]
+    # The word itself isn't a split
+    return pieces if pieces is not None and len(pieces) > 1 else None
+
+
+def letters_to_sound(word: str) -> str:
+    """
+    IPA guessed from the spelling by RULES.
+
+    Args:
+        word(str): Lower case word, e.g. "qwzxv"
+
+    Returns:
+        str: IPA
+    """
+    letters = "".join(letter for letter in word if letter.isalpha())
+    # A silent e at the end, e.g. "bake"
+    if len(letters) > 3 and letters.endswith("e") and letters[-2] not in VOWEL_LETTERS:
+        letters = letters[:-1]
+
+    ipa: list[str] = list()
+    position = 0
+    while position < len(letters):
+        letter = letters[position]
+        following = letters[position + 1:position + 2]
+        # Double consonants are read once, e.g. "ll"
+        if position > 0 and letter == letters[position - 1] and letter not in VOWEL_LETTERS:
+            position += 1
+            continue
+
+        for length in range(min(LONGEST_RULE, len(letters) - position), 1, -1):
+            spelling = letters[position:position + length]
+            if spelling in RULES:
+                ipa.append(RULES[spelling])
+                position += length
+                break
+        else:
+            # A single letter, read by the letter after it
+            if letter == "c":
+                ipa.append("s" if following and following in "eiy" else "k")
+            elif letter == "g":
+                ipa.append("ʤ" if following and following in "ei" else "ɡ")
+            elif letter == "y":
+                ipa.append("j" if position == 0 else "iː" if position == len(letters) - 1 else "ɪ")
+            else:
+                ipa.append(RULES.get(letter, ""))
+            position += 1
+    return "".join(ipa)
+
+
+def guess(word: str, dictionary: Mapping) -> str:
+    """
+    IPA of a word missing in the dictionary.
+    It is joined from the sub-words in the dictionary, or guessed from the spelling.
+
+    Args:
+        word(str): Lower case word
+        dictionary(Mapping): word: IPA
+
+    Returns:
+        str: IPA, "" when the word has no letters
+    """
+    pieces = split_known(word, dictionary)
+    if pieces is not None:
+        return "".join(dictionary[piece] for piece in pieces)
+    return letters_to_sound(word)
@@ -1,48 +1,73 @@
-import csv
 import re
+import threading
 from typing import Optional
 
+from config.loader import load_settings
+from usecases import metrics, user_dict
+from usecases.cache import LRUCache, normalize, text_key
+from usecases.english import cmu_index, g2p
+from usecases.english.oov import OOVWords
+
 
 class IPA:
     """Add tags of HTML by pronunciations of English"""
 
     _has_instance = None
+    _lock = threading.Lock()
+    _dict_data: Optional[cmu_index.CMUIndex] = None
 
     def __new__(cls):
-        if not cls._has_instance:
-            cls._has_instance = super(IPA, cls).__new__(cls)
-            cls.__re_compile()
+        with cls._lock:
+            if not cls._has_instance:
+                cls._has_instance = super(IPA, cls).__new__(cls)
+                cls.__re_compile()
+
+                settings = load_settings()
+                sizes: dict[str, int] = settings["CACHE"]
+                # (word, IPA) -> ruby of the word
+                cls.word_cache = LRUCache("english.words", sizes["WORDS"])
+                # hash of the whole text -> HTML
+                cls.html_cache = LRUCache("english.html", sizes["HTML"])
+                # word missing in the dictionary -> IPA guessed by g2p
+                cls.oov_cache = LRUCache("english.oov", sizes["OOV"])
+                cls.fallback: bool = settings["ENGLISH"]["FALLBACK"]
+                cls.oov_words = OOVWords(settings["ENGLISH"]["OOV_FLUSH_INTERVAL"])
+                # Words and phrases with known IPA, read before the CMU dictionary
+                cls.user_dict = user_dict.open_dictionary(settings["USER_DICT"]["ENGLISH"],
+                                                          settings["USER_DICT"]["RELOAD_INTERVAL"],
+                                                          on_reload=cls.html_cache.clear)
         return cls._has_instance
 
-    def __init__(self) -> None:
-        # Load words dictionary
-        with open('./domains/english/dict/cmudict', mode='r', newline='', encoding='utf-8') as f:
-            tsv_reader = csv.reader(f, delimiter=' ')
-            # read_data[i][0]: word
-            # read_data[i][1:]: phonetics
-            read_data = [row for row in tsv_reader]
-            self.dict_data: dict[str, list[str]] = {read_data[i][0]: read_data[i][1:] for i in range(len(read_data))}
-
-        # Load IPA symbols
-        with open('./domains/english/dict/symbols', mode='r', newline='', encoding='utf-8') as f:
-            tsv_reader = csv.reader(f, delimiter=' ')
-            # symbols[i][0]: Alphabet
-            # symbols[i][1:]: IPA symbol
-            symbols = [row for row in tsv_reader]
-            self.symbols: dict[str, str] = {symbols[i][0]: symbols[i][1:] for i in range(len(symbols))}
-
-        # Vowel's symbols for using to change phonetics of "the" before vowels
-        with open('./domains/english/dict/vowels', mode='r', newline='', encoding='utf-8') as f:
-            tsv_reader = csv.reader(f, delimiter=' ')
-            self.vowels: tuple[str] = [tuple(vowels) for vowels in tsv_reader][0]
-
-        # In sentence, when after word is vowel, this value is True.
-        self.is_after_vowel = False
+    @property
+    def dict_data(self) -> cmu_index.CMUIndex:
+        """
+        Words dictionary compiled with IPA symbols, mapped from the disk on first use.
+        dict_data[word]: IPA
+        """
+        if self._dict_data is None:
+            with self._lock:
+                if self._dict_data is None:
+                    IPA._dict_data = cmu_index.load()
+        return self._dict_data
+
+    @property
+    def vowels(self) -> tuple[str]:
+        """Vowel's symbols for using to change phonetics of "the" before vowels"""
+        return self.dict_data.vowels
+
+    @property
+    def version(self) -> str:
+        """Version of the pronunciations. It changes with the dictionaries and the fallback."""
+        fingerprint = "-".join(str(value) for value in self.dict_data.fingerprint)
+        version = f"cmudict:{fingerprint}:fallback={self.fallback}"
+        if self.user_dict is not None:
+            version += f":{self.user_dict.version}"
+        return version
 
     @classmethod
     def __re_compile(cls) -> None:
         """Regular expression patterns"""
-        cls.re_non_ascii = re.compile("[^a-zA-Z0-9\']")
+        cls.re_non_ascii = user_dict.RE_ENGLISH_IGNORED
 
     def export_html(self, text_post: str) -> str:
         """
@@ -52,20 +77,72 @@ class IPA:
         Returns:
             str: HTML format text
         """
-        sentences: list = list()
-        line: str = ""
+        # Every line is joined with "<br>\n" in one pass, and the text is converted as one sentence.
+        # The dictionary is checked before the cache, so a reload clears the HTML of the former words first
+        if self.user_dict is not None:
+            self.user_dict.current()
+        text = normalize(text_post)
+        key = text_key(text)
+        html = self.html_cache.get(key)
+        if html is not None:
+            return html
+
+        with metrics.stage("english", "lookup"):
+            phonetics = self._fetch_phonetics([text])
+        with metrics.stage("english", "render"):
+            html = self._render(phonetics)
+        metrics.TOKENS.inc("english", amount=len(phonetics))
 
-        texts = "<br>\n".join(text_post.splitlines())
+        self.html_cache.set(key, html)
+        return html
+
+    def export_tokens(self, text_post: str) -> list[tuple[str, str, int, int]]:
+        """
+        Words and their IPA with the offsets in the text, without the ruby.
+        Words without IPA aren't listed, since they are shown as they are.
 
-        for text in texts:
-            for word in text:
-                line += word
-        sentences.append(line)
+        Args:
+            text_post(str): Wish the text to add phonetics.
+
+        Returns:
+            List[Tuple[str, str, int, int]]: [(word, IPA, start, end), ...]
+                text_post[start:end] is the word
+        """
+        with metrics.stage("english", "lookup"):
+            phonetics = self._fetch_phonetics([text_post])
+        metrics.TOKENS.inc("english", amount=len(phonetics))
+
+        tokens: list[tuple[str, str, int, int]] = list()
+        position = 0
+        for word, ipa in phonetics:
+            # A phrase of the user dictionary is found word by word, since the spaces between them may differ
+            pieces = word.split()
+            start = text_post.index(pieces[0], position)
+            position = start + len(pieces[0])
+            for piece in pieces[1:]:
+                position = text_post.index(piece, position) + len(piece)
+            if ipa != "":
+                tokens.append((text_post[start:position], ipa, start, position))
+        return tokens
+
+    def _render(self, words: list[tuple[str, str]]) -> str:
+        """
+        Put the ruby on each word, reusing the ruby of the words already seen.
 
-        phonetics = self._fetch_phonetics(sentences)
-        converted: list[Optional[str]] = self._put_on(phonetics)
+        Args:
+            words (List[Tuple[str, str]]): [(original word, IPA), ...]
 
-        return "".join(converted)
+        Returns:
+            str: HTML format text
+        """
+        fragments: list[str] = list()
+        for word in words:
+            fragment = self.word_cache.get(word)
+            if fragment is None:
+                fragment = self._put_on([word])[0]
+                self.word_cache.set(word, fragment)
+            fragments.append(fragment)
+        return "".join(fragments)
 
     def _fetch_phonetics(self, sentences: list[str]) -> list[tuple[str, str]]:
         """
@@ -76,57 +153,101 @@ class IPA:
             List[Tuple[str, str]: [(original word, IPA), ...]
         """
         word_list: list[tuple[str, str]] = list()
+        # When the word after is vowel, this value is True.
+        # It is kept for each call, so conversions can run in parallel.
+        is_after_vowel = False
+
+        dictionary = self.user_dict.current() if self.user_dict is not None else None
 
-        for sentence in sentences:
-            # To check the vowels behind “The”, it processes from the reverse of sentence
-            for word in reversed(sentence.split()):
-                word_list.append(self._distinguish_the(word))
-            word_list.reverse()
+        # To check the vowels behind “The”, it processes from the reverse of sentences
+        for sentence in reversed(sentences):
+            for word, ipa in reversed(self._user_words(sentence.split(), dictionary)):
+                if ipa is None:
+                    word, ipa = self._distinguish_the(word, is_after_vowel)
+                if ipa != "":
+                    is_after_vowel = ipa.startswith(self.vowels)
+                word_list.append((word, ipa))
+        word_list.reverse()
         return word_list
 
-    def _distinguish_the(self, word: str) -> tuple[str, str]:
+    def _user_words(self, words: list[str],
+                    dictionary: Optional[user_dict.UserDictionary]) -> list[tuple[str, Optional[str]]]:
+        """
+        Join the phrases of the user dictionary in one pass, and give their IPA.
+        A phrase doesn't go over a line break.
+
+        Args:
+            words (List[str]): Words split by the spaces
+            dictionary (Optional[UserDictionary]): User dictionary, or None without it
+
+        Returns:
+            List[Tuple[str, Optional[str]]]: [(word or phrase, IPA or None to look it up), ...]
+        """
+        if dictionary is None:
+            return [(word, None) for word in words]
+
+        joined: list[tuple[str, Optional[str]]] = list()
+        line: list[str] = list()
+        for number, word in enumerate(words):
+            line.append(word)
+            if "<br>" not in word and number < len(words) - 1:
+                continue
+            position = 0
+            for start, end, ipa in dictionary.match_words([user_dict.english_key(self._target(word))
+                                                           for word in line]):
+                joined.extend((word, None) for word in line[position:start])
+                joined.append((" ".join(line[start:end]), ipa))
+                metrics.USER_WORDS.inc("english")
+                position = end
+            joined.extend((word, None) for word in line[position:])
+            line = list()
+        return joined
+
+    def _target(self, word: str) -> str:
+        """The letters of the word looked up in the dictionaries"""
+        return re.sub(self.re_non_ascii, "", word.replace("<br>", ""))
+
+    def _distinguish_the(self, word: str, is_after_vowel: bool = False) -> tuple[str, str]:
         """
         The word after "the" distinguished vowel or not vowel
         If the word is vowel, the "the" phonetic's is "ðiː"
         Args:
             word (str): target word
+            is_after_vowel (bool): The word after the target begins with a vowel
 
         Returns:
             Tuple[str, str]: (word, phonetic)
         """
-        target = word.replace("<br>", "")
-        target = re.sub(self.re_non_ascii, "", target)
+        target = self._target(word)
 
         if target == "":
             ipa = ""
-        elif target.lower() == "the" and self.is_after_vowel:
+        elif target.lower() == "the" and is_after_vowel:
             ipa = "ðiː"
-            self.is_after_vowel = False
         else:
             try:
-                ipa = self._convert_ipa(self.dict_data[target.lower()])
-                if ipa.startswith(self.vowels):
-                    self.is_after_vowel = True
-                else:
-                    self.is_after_vowel = False
-            except KeyError as key:
-                print(f"{key} is nothing in the CMU dictionary.")
-                ipa = ""
+                ipa = self.dict_data[target.lower()]
+            except KeyError:
+                metrics.OOV.inc("english")
+                self.oov_words.add(target.lower())
+                ipa = self._guess(target.lower()) if self.fallback else ""
         return word, ipa
 
-    def _convert_ipa(self, alphabets: list[str]) -> str:
+    def _guess(self, word: str) -> str:
         """
-        Convert from Alphabet to IPA.
+        IPA of a word missing in the CMU dictionary, guessed once per process.
+
         Args:
-            alphabets(List[str]): target word's Arpabet
+            word (str): Lower case word
+
         Returns:
-            (str): IPA symbols
+            str: IPA
         """
-        phonetics: str = ""
-        for alphabet in alphabets:
-            phonetics += self.symbols[alphabet][0]
-
-        return phonetics
+        ipa = self.oov_cache.get(word)
+        if ipa is None:
+            ipa = g2p.guess(word, self.dict_data)
+            self.oov_cache.set(word, ipa)
+        return ipa
 
     @classmethod
     def _put_on(cls, words_list: list[tuple[str, str]]) -> list[str]:
@@ -0,0 +1,60 @@
+import collections
+import threading
+import time
+from typing import Optional
+
+
+class OOVWords:
+    """
+    Count the words missing in the CMU dictionary and report them periodically,
+    instead of writing to the console on every miss.
+    """
+
+    def __init__(self, flush_interval: float = 60.0, max_words: int = 10_000, top: int = 20) -> None:
+        """
+        Args:
+            flush_interval(float): Seconds between the reports. 0 disables the background thread.
+            max_words(int): Number of distinct words counted until the next report
+            top(int): Number of the most frequent words reported
+        """
+        self.flush_interval = flush_interval
+        self.max_words = max_words
+        self.top = top
+        self.total = 0
+        self._words: collections.Counter = collections.Counter()
+        # Misses of the words over max_words
+        self._others = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, word: str) -> None:
+        with self._lock:
+            self.total += 1
+            if word in self._words or len(self._words) < self.max_words:
+                self._words[word] += 1
+            else:
+                self._others += 1
+            if self._thread is None and self.flush_interval > 0:
+                self._thread = threading.Thread(target=self._run, name="oov-flusher", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> collections.Counter:
+        """
+        Report the words counted since the last report and start again.
+
+        Returns:
+            collections.Counter: word: misses
+        """
+        with self._lock:
+            words, self._words = self._words, collections.Counter()
+            others, self._others = self._others, 0
+        misses = sum(words.values()) + others
+        if misses:
+            frequent = ", ".join(f"{word}({count})" for word, count in words.most_common(self.top))
+            print(f"{misses} words are nothing in the CMU dictionary: {frequent}")
+        return words
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
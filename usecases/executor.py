@@ -0,0 +1,271 @@
+import asyncio
+import importlib
+import threading
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from usecases import disk_cache, metrics, mixed, profiler
+from usecases.cache import normalize, text_key
+
+# language: "module:class" of the engine, imported on first use
+ENGINES: dict[str, str] = {
+    "japanese": "usecases.japanese.kana_phonetics:Furigana",
+    "english": "usecases.english.ipa_phonetics:IPA",
+}
+
+
+def engine(language: str) -> Any:
+    """
+    The singleton engine of a language.
+
+    Args:
+        language(str): "japanese" or "english"
+
+    Returns:
+        Furigana or IPA
+    """
+    module, name = ENGINES[language].split(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def engine_version(language: str) -> str:
+    """
+    Version of the results of an engine in the disk cache.
+    It changes when a new user dictionary is read.
+    """
+    return stored_version(language, engine(language).version)
+
+
+@lru_cache(maxsize=None)
+def stored_version(language: str, version: str) -> str:
+    """
+    Version of the results in the disk cache for a version of an engine.
+    The results of the other versions are deleted the first time it is asked in a process.
+    """
+    version = f"{disk_cache.FORMAT_VERSION}:{version}"
+    store = disk_cache.instance()
+    if store is not None:
+        store.invalidate(language, version)
+    return version
+
+
+def convert(language: str, text: str) -> str:
+    """
+    Add pronunciations to the text. This runs inside the workers.
+    With the disk cache, the results converted by the other workers are reused.
+    """
+    store = disk_cache.instance()
+    if store is None:
+        return _convert(language, text)
+
+    version = engine_version(language)
+    key = text_key(normalize(text))
+    html = store.get(language, version, key)
+    if html is None:
+        html = _convert(language, text)
+        store.set(language, version, key, html)
+    return html
+
+
+def _convert(language: str, text: str) -> str:
+    slow = profiler.instance()
+    with metrics.CONVERSION_SECONDS.time(language), \
+            (slow.profile(language, len(text)) if slow is not None else nullcontext()):
+        return engine(language).export_html(text)
+
+
+def tokens(language: str, text: str) -> list[tuple[str, str, int, int]]:
+    """Words, readings and offsets of the text. This runs inside the workers."""
+    with metrics.CONVERSION_SECONDS.time(language):
+        return engine(language).export_tokens(text)
+
+
+def convert_many(texts: list[str], batch_size: int, n_process: int) -> list[str]:
+    """Add furigana to many Japanese texts at once. This runs inside the workers."""
+    return engine("japanese").export_html_many(texts, batch_size=batch_size, n_process=n_process)
+
+
+def convert_spans(language: str, spans: list[str], batch_size: int = 64) -> list[str]:
+    """Add pronunciations to the spans of a mixed text. This runs inside the workers."""
+    if language == "japanese":
+        return engine(language).export_html_many(spans, batch_size=batch_size)
+    return [engine(language).export_html(span) for span in spans]
+
+
+def tokens_spans(language: str, spans: list[str]) -> list[list[tuple[str, str, int, int]]]:
+    """Words, readings and offsets of the spans of a mixed text. This runs inside the workers."""
+    with metrics.CONVERSION_SECONDS.time(language):
+        return [engine(language).export_tokens(span) for span in spans]
+
+
+# language: text converted to load the model and dictionary of the engine
+SAMPLES: dict[str, str] = {
+    "japanese": "漢字",
+    "english": "the",
+}
+
+
+def warm_up(languages: tuple[str, ...]) -> dict[str, float]:
+    """
+    Load the models and dictionaries, which are otherwise loaded by the first conversion.
+
+    Args:
+        languages(tuple[str, ...]): Languages to load
+
+    Returns:
+        dict[str, float]: Seconds taken by each language
+    """
+    seconds: dict[str, float] = dict()
+    for language in languages:
+        start = time.perf_counter()
+        engine(language).export_html(SAMPLES[language])
+        seconds[language] = time.perf_counter() - start
+    return seconds
+
+
+class Saturated(Exception):
+    """All workers are busy and the queue is full."""
+
+
+class ConversionExecutor:
+    """
+    Run the blocking conversions outside of the event loop.
+
+    The number of conversions running or waiting is bounded,
+    so a burst of requests is rejected instead of piling up.
+    The same text requested while it is being converted is converted only once.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 16,
+                 preload: tuple[str, ...] = ()) -> None:
+        """
+        Args:
+            kind(str): "thread" or "process"
+            max_workers(int): Number of threads or processes
+            max_queue(int): Number of conversions allowed to wait for a worker
+            preload(tuple[str, ...]): Languages loaded by each process when it starts
+        """
+        self._executor: Executor
+        if kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="conversion")
+        elif kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers, initializer=warm_up, initargs=(preload,))
+        else:
+            raise ValueError(f"{kind} is not a kind of executor.")
+
+        self.capacity: int = max_workers + max_queue
+        self.pending: int = 0
+        self.coalesced: int = 0
+        self._lock = threading.Lock()
+        # (language, key of the text): conversion in flight
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = dict()
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def submit(self, func: Callable, *args) -> Any:
+        """
+        Run the function in a worker and wait for the result.
+
+        Raises:
+            Saturated: When the executor is already at its capacity.
+        """
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise Saturated(f"{self.pending} conversions are already in progress.")
+            self.pending += 1
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is released when the worker finishes, even if the request has gone.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def convert(self, language: str, text: str) -> str:
+        """
+        Add pronunciations to the text in a worker.
+        When the same text is already in flight, its result is awaited instead.
+
+        Args:
+            language(str): "japanese" or "english"
+            text(str): Wish the text to add phonetics.
+
+        Returns:
+            str: HTML format text
+        """
+        key = (language, text_key(normalize(text)))
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            metrics.COALESCED.inc(language)
+        else:
+            future = asyncio.ensure_future(self.submit(convert, language, text))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # A client which goes away doesn't cancel the conversion awaited by the others
+        return await asyncio.shield(future)
+
+    async def tokens(self, language: str, text: str) -> list[tuple[str, str, int, int]]:
+        """
+        Words, readings and offsets of the text in a worker, without the ruby.
+
+        Args:
+            language(str): "japanese" or "english"
+            text(str): Wish the text to add phonetics.
+
+        Returns:
+            list[tuple[str, str, int, int]]: [(word, reading, start, end), ...]
+        """
+        return await self.submit(tokens, language, text)
+
+    async def convert_many(self, texts: list[str], batch_size: int, n_process: int) -> list[str]:
+        """
+        Add furigana to many Japanese texts in a worker.
+
+        Args:
+            texts(list[str]): Wish the texts to add the ruby
+            batch_size(int): Number of texts in a batch of spaCy
+            n_process(int): Number of processes of spaCy. It must be 1 with the process pool.
+
+        Returns:
+            list[str]: HTML format texts in the order of the input
+        """
+        return await self.submit(convert_many, texts, batch_size, n_process)
+
+    async def convert_mixed(self, text: str, output: str = "html", batch_size: int = 64):
+        """
+        Add pronunciations to a text mixing Japanese and English.
+        Only the spans with kanji go to Furigana and only the Latin words go to IPA,
+        and the two languages are converted in the workers at the same time.
+
+        Args:
+            text(str): Wish the text to add phonetics.
+            output(str): "html" or "tokens"
+            batch_size(int): Number of Japanese spans in a batch of spaCy
+
+        Returns:
+            str or list[tuple[str, str, int, int]]: HTML, or [(word, reading, start, end), ...]
+        """
+        spans = mixed.segment(text)
+        texts = {language: mixed.texts_of(text, spans, language) for language in mixed.LANGUAGES}
+        # A language without spans isn't sent to the workers
+        languages = [language for language in mixed.LANGUAGES if texts[language]]
+        if output == "tokens":
+            jobs = [self.submit(tokens_spans, language, texts[language]) for language in languages]
+        else:
+            jobs = [self.submit(convert_spans, language, texts[language], batch_size) for language in languages]
+        converted = dict(zip(languages, await asyncio.gather(*jobs)))
+
+        if output == "tokens":
+            return mixed.stitch_tokens(spans, converted)
+        return mixed.stitch_html(text, spans, converted)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,232 @@
+import re
+import time
+from functools import lru_cache
+from importlib import metadata
+from typing import Iterable, Iterator
+
+from usecases import metrics
+from usecases.japanese.words import WordBuffer
+
+
+def doc_words(doc) -> WordBuffer:
+    """
+    Words and Katakana of a document parsed by spaCy.
+    Only the offsets and the readings are copied, so the document can be released right after.
+
+    Args:
+        doc (spacy.tokens.Doc): Parsed by GiNZA
+
+    Returns:
+        WordBuffer: Words of doc.text
+    """
+    # The readings are indexed by the position of the token in its own document.
+    with metrics.stage("japanese", "reading"):
+        reading_forms: list[str] = doc.user_data["reading_forms"]
+        words = WordBuffer(doc.text)
+        for token in doc:
+            words.append(token.idx, token.idx + len(token), reading_forms[token.i])
+        return words
+
+
+# A space after a word belongs to the word, as the tokenizer of spaCy does, so it isn't written.
+RE_TRAILING_SPACE = re.compile(r"(?<=\S) ")
+
+
+def plain_words(text: str) -> WordBuffer:
+    """
+    A text which has nothing to read, as words without readings.
+    The spaces are kept as `parse` keeps them.
+
+    Args:
+        text (str): Text without kanji
+
+    Returns:
+        WordBuffer: The text split at the spaces after the words, without readings
+    """
+    words = WordBuffer(text)
+    position = 0
+    for space in RE_TRAILING_SPACE.finditer(text):
+        words.append(position, space.start(), "")
+        position = space.end()
+    if position < len(text):
+        words.append(position, len(text), "")
+    return words
+
+
+class GinzaBackend:
+    """The full pipeline of ja_ginza: tokenizer, parser, NER and vectors."""
+
+    def __init__(self) -> None:
+        import spacy
+        self.nlp = spacy.load("ja_ginza")
+
+    def parse(self, text: str) -> WordBuffer:
+        """
+        Words and readings of a text.
+
+        Args:
+            text (str): To convert a text
+
+        Returns:
+            WordBuffer: Words of the text with their katakana
+        """
+        with metrics.stage("japanese", "tokenize"):
+            doc = self.nlp(text)
+        return doc_words(doc)
+
+    def parse_many(self, texts: Iterable[str], batch_size: int = 64,
+                   n_process: int = 1) -> Iterator[WordBuffer]:
+        """
+        Words and readings of many texts, parsed in batches by `nlp.pipe`.
+
+        Args:
+            texts (Iterable[str]): To convert texts
+            batch_size (int): Number of texts in a batch of spaCy
+            n_process (int): Number of processes of spaCy
+
+        Yields:
+            WordBuffer: Words of each text in the order of the input
+        """
+        docs = iter(self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process))
+        while True:
+            # The time to wait for each document is the time to tokenize it, shared with its batch.
+            start = time.perf_counter()
+            doc = next(docs, None)
+            if doc is None:
+                return
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "japanese", "tokenize")
+            words = doc_words(doc)
+            # Only one document is alive while the words are used
+            del doc
+            yield words
+
+
+class TokenizerBackend(GinzaBackend):
+    """
+    Only the tokenizer of ja_ginza.
+    The readings are given by the tokenizer, so the other components are never loaded.
+    """
+
+    def __init__(self) -> None:
+        import spacy
+        from spacy.util import get_model_meta, get_package_path
+
+        components: list[str] = get_model_meta(get_package_path("ja_ginza"))["components"]
+        self.nlp = spacy.load("ja_ginza", exclude=components)
+
+
+class SudachiBackend:
+    """SudachiPy without spaCy. The words are aligned to the text as the tokenizer of spaCy does."""
+
+    def __init__(self) -> None:
+        from sudachipy import dictionary, tokenizer
+
+        # ja_ginza tokenizes with the split mode C
+        self.tokenizer = dictionary.Dictionary().create()
+        self.mode = tokenizer.Tokenizer.SplitMode.C
+
+    def parse(self, text: str) -> WordBuffer:
+        """
+        Words and readings of a text.
+
+        Args:
+            text (str): To convert a text
+
+        Returns:
+            WordBuffer: Words of the text with their katakana
+        """
+        with metrics.stage("japanese", "tokenize"):
+            morphemes = [(m.surface(), m.reading_form()) for m in self.tokenizer.tokenize(text, self.mode)]
+        with metrics.stage("japanese", "reading"):
+            return self._align(text, morphemes)
+
+    @staticmethod
+    def _align(text: str, morphemes: list[tuple[str, str]]) -> WordBuffer:
+        """Words of the morphemes, with the spaces of the text put as spaCy does."""
+        words = WordBuffer(text)
+        if not morphemes:
+            return words
+        if all(surface.isspace() for surface, _ in morphemes):
+            words.append(0, len(text), text)
+            return words
+
+        position = 0
+        for i, (surface, reading) in enumerate(morphemes):
+            if surface.isspace():
+                continue
+            start = text.index(surface, position)
+            # Spaces which don't follow a word are words themselves
+            if start > position:
+                words.append(position, start, text[position:start])
+            words.append(start, start + len(surface), reading)
+            position = start + len(surface)
+            # A space after a word is a part of the word
+            if i + 1 < len(morphemes) and morphemes[i + 1][0] == " ":
+                position += 1
+        if position < len(text):
+            words.append(position, len(text), text[position:])
+        return words
+
+    def parse_many(self, texts: Iterable[str], batch_size: int = 64,
+                   n_process: int = 1) -> Iterator[WordBuffer]:
+        """
+        Words and readings of many texts. batch_size and n_process aren't used.
+
+        Yields:
+            WordBuffer: Words of each text in the order of the input
+        """
+        for text in texts:
+            yield self.parse(text)
+
+
+# backend: packages which decide the readings
+PACKAGES: dict[str, tuple[str, ...]] = {
+    "ginza": ("ja-ginza", "ginza", "spacy", "sudachidict-core"),
+    "tokenizer": ("ja-ginza", "ginza", "spacy", "sudachidict-core"),
+    "sudachi": ("sudachipy", "sudachidict-core"),
+}
+
+
+@lru_cache(maxsize=None)
+def version(name: str) -> str:
+    """
+    Version of a backend, made of the versions of its packages.
+    It changes when the model or the dictionary is updated.
+
+    Args:
+        name (str): "ginza", "tokenizer" or "sudachi"
+
+    Returns:
+        str: e.g. "sudachi:sudachipy=0.5.2,sudachidict-core=20210802"
+    """
+    versions: list[str] = list()
+    for package in PACKAGES[name]:
+        try:
+            versions.append(f"{package}={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}=none")
+    return f"{name}:{','.join(versions)}"
+
+
+BACKENDS = {
+    "ginza": GinzaBackend,
+    "tokenizer": TokenizerBackend,
+    "sudachi": SudachiBackend,
+}
+
+
+def load(name: str):
+    """
+    Load a reading backend.
+
+    Args:
+        name (str): "ginza", "tokenizer" or "sudachi"
+
+    Returns:
+        GinzaBackend, TokenizerBackend or SudachiBackend
+    """
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"{name} is not a reading backend.") from None
+    return backend()
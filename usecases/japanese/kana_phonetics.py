@@ -1,20 +1,57 @@
 import re
+import threading
+from typing import Optional
 
 import jaconv
-import spacy
+
+from config.loader import load_settings
+from usecases import metrics, user_dict
+from usecases.cache import LRUCache, normalize, text_key
+from usecases.japanese import backends
+from usecases.japanese.words import WordBuffer
 
 
 class Furigana:
     """Add tags of HTML by pronunciations of Kanji."""
     _has_instance = None
+    _lock = threading.Lock()
+    _backend = None
 
     def __new__(cls):
-        if not cls._has_instance:
-            cls._has_instance = super(Furigana, cls).__new__(cls)
-            cls.__re_compile()
-            cls.nlp = spacy.load("ja_ginza")
+        with cls._lock:
+            if not cls._has_instance:
+                cls._has_instance = super(Furigana, cls).__new__(cls)
+                cls.__re_compile()
+
+                settings = load_settings()
+                sizes: dict[str, int] = settings["CACHE"]
+                # (word, katakana) -> ruby of the word
+                cls.word_cache = LRUCache("japanese.words", sizes["WORDS"])
+                # hash of the whole text -> HTML
+                cls.html_cache = LRUCache("japanese.html", sizes["HTML"])
+                # Words with known readings, which aren't parsed by the model
+                cls.user_dict = user_dict.open_dictionary(settings["USER_DICT"]["JAPANESE"],
+                                                          settings["USER_DICT"]["RELOAD_INTERVAL"],
+                                                          on_reload=cls.html_cache.clear)
         return cls._has_instance
 
+    @property
+    def backend(self):
+        """Tokenizes the text and gives the readings. The model is loaded on first use."""
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    Furigana._backend = backends.load(load_settings()["JAPANESE"]["BACKEND"])
+        return self._backend
+
+    @property
+    def version(self) -> str:
+        """Version of the readings, without loading the model"""
+        version = backends.version(load_settings()["JAPANESE"]["BACKEND"])
+        if self.user_dict is not None:
+            version += f":{self.user_dict.version}"
+        return version
+
     def export_html(self, text_post: str) -> str:
         """
         The text file change to HTML sentences.
@@ -25,23 +62,102 @@ class Furigana:
         Returns:
             str: HTML format text
         """
+        # Every line is joined with "<br>\n" in one pass, and the text is converted as one sentence.
+        # The dictionary is checked before the cache, so a reload clears the HTML of the former words first
+        if self.user_dict is not None:
+            self.user_dict.current()
+        text = normalize(text_post)
+        key = text_key(text)
+        html = self.html_cache.get(key)
+        if html is not None:
+            return html
 
-        sentences: list = list()
-        line: str = ""
+        words = self._fetch_words_many([text])[0]
+        with metrics.stage("japanese", "render"):
+            html = self._render(words)
+        metrics.TOKENS.inc("japanese", amount=len(words))
 
-        texts = "<br>\n".join(text_post.splitlines())
+        self.html_cache.set(key, html)
+        return html
 
-        for text in texts:
-            for word in text:
-                line += word
-        sentences.append(line)
+    def export_html_many(self, texts: list[str], batch_size: int = 64, n_process: int = 1) -> list[str]:
+        """
+        Many texts change to HTML sentences at once.
+        With the spaCy backends, the texts are streamed through `nlp.pipe` and parsed in batches.
+
+        Args:
+            texts (List[str]): Wish the texts to add the ruby
+            batch_size (int): Number of texts in a batch of spaCy
+            n_process (int): Number of processes of spaCy
+
+        Returns:
+            List[str]: HTML format texts in the order of the input
+        """
+        # The dictionary is checked before the cache, so a reload clears the HTML of the former words first
+        if self.user_dict is not None:
+            self.user_dict.current()
+        sentences: list[str] = [normalize(text) for text in texts]
+        keys: list[str] = [text_key(sentence) for sentence in sentences]
+        converted: list[str] = [self.html_cache.get(key) for key in keys]
+
+        # Only the texts which aren't cached are parsed
+        missing: list[int] = [i for i, html in enumerate(converted) if html is None]
+        parsed = self._fetch_words_many([sentences[i] for i in missing], batch_size=batch_size, n_process=n_process)
+        for i, words in zip(missing, parsed):
+            with metrics.stage("japanese", "render"):
+                converted[i] = self._render(words)
+            metrics.TOKENS.inc("japanese", amount=len(words))
+            self.html_cache.set(keys[i], converted[i])
+        return converted
+
+    def export_tokens(self, text_post: str) -> list[tuple[str, str, int, int]]:
+        """
+        Words with kanji and their hiragana with the offsets in the text, without the ruby.
+        The other words aren't listed, since they are shown as they are.
+
+        Args:
+            text_post (str): Wish the text to add the ruby
+
+        Returns:
+            List[Tuple[str, str, int, int]]: [(word, hiragana, start, end), ...]
+                text_post[start:end] is the word
+        """
+        words = self._fetch_words_many([text_post])[0]
+        metrics.TOKENS.inc("japanese", amount=len(words))
 
-        fetch_char: list[tuple[str, str]] = self._fetch_characters(sentences)
-        phonetic_list: list[tuple[str, str]] = self._remove_ascii_and_hiragana(
-            fetch_char)
-        converted: list[str] = self._put_on(phonetic_list)
+        tokens: list[tuple[str, str, int, int]] = list()
+        # The offsets of the words are already those in the text
+        for word, reading, start, end in words.spans():
+            if reading == "" or not self._needs_reading(word):
+                continue
+            tokens.append((word, jaconv.kata2hira(reading), start, end))
+        return tokens
+
+    def _render(self, words: WordBuffer) -> str:
+        """
+        Put the ruby on each word in one pass, reusing the ruby of the words already seen.
+
+        Args:
+            words (WordBuffer): Words with their katakana
 
-        return "".join(converted)
+        Returns:
+            str: HTML format text
+        """
+        text = words.text
+        fragments: list[str] = list()
+        for start, end, reading in zip(words.starts, words.ends, words.readings):
+            word = text[start:end]
+            # Nothing to put on, so the word isn't cached
+            if not self._needs_reading(word):
+                fragments.append(word)
+                continue
+            key = (word, reading)
+            fragment = self.word_cache.get(key)
+            if fragment is None:
+                fragment = self._ruby(word, jaconv.kata2hira(reading))
+                self.word_cache.set(key, fragment)
+            fragments.append(fragment)
+        return "".join(fragments)
 
     @classmethod
     def __re_compile(cls) -> None:
@@ -51,27 +167,127 @@ class Furigana:
         cls.re_zenkigou: str = re.compile("︰-＠")
         cls.re_kanji: str = re.compile("[一-龥]")
         cls.re_ascii: str = re.compile("[!-~]")
+        # A sentence ends with its punctuation or line break and the spaces after it
+        cls.re_sentence: str = re.compile("[^。！？!?\n]*[。！？!?\n]* *")
+
+    def _needs_reading(self, text: str) -> bool:
+        """The text has a character which gets the ruby"""
+        return bool(re.search(self.re_kanji, text) or re.search(self.re_zenkigou, text))
 
-    def _fetch_characters(self, sentences: list[str]) -> list[tuple[str, str]]:
+    def _split_sentences(self, text: str) -> list[str]:
         """
-        Convert text to list of originals and Katakana.
+        Split the text into sentences. Joined, they are the text.
+
+        Args:
+            text (str): e.g. "漢字。かな。"
+
+        Returns:
+            List[str]: e.g. ["漢字。", "かな。"]
+        """
+        return [sentence for sentence in re.findall(self.re_sentence, text) if sentence]
+
+    def _fetch_words_many(self, texts: list[str], batch_size: int = 64,
+                          n_process: int = 1) -> list[WordBuffer]:
+        """
+        Originals and Katakana of many texts.
+        Only the sentences with kanji are parsed by the backend,
+        and the others pass through as words without readings.
+        The words of the user dictionary are cut out of the sentences before they are parsed.
+
+        Args:
+            texts (List[str]): To convert texts
+            batch_size (int): Number of sentences in a batch of spaCy
+            n_process (int): Number of processes of spaCy
+
+        Returns:
+            List[WordBuffer]: Words of each text in the order of the input
+        """
+        dictionary = self.user_dict.current() if self.user_dict is not None else None
+
+        # Pieces of each text: (piece, None) is parsed, (piece, "") has nothing to read,
+        # and (piece, katakana) is a word of the user dictionary.
+        # Most texts without kanji are found by one scan, without splitting them
+        splits: list[list[tuple[str, Optional[str]]]] = list()
+        for text in texts:
+            if self._needs_reading(text):
+                pieces: list[tuple[str, Optional[str]]] = list()
+                for sentence in self._split_sentences(text):
+                    if self._needs_reading(sentence):
+                        pieces.extend(self._user_pieces(sentence, dictionary))
+                    else:
+                        pieces.append((sentence, ""))
+                splits.append(pieces)
+            else:
+                splits.append([(text, "")])
+
+        to_parse: list[str] = [piece for pieces in splits for piece, reading in pieces if reading is None]
+        skipped = sum(1 for pieces in splits for _, reading in pieces if reading == "")
+        metrics.SENTENCES.inc("japanese", "parsed", amount=len(to_parse))
+        metrics.SENTENCES.inc("japanese", "skipped", amount=skipped)
+        # The model isn't even loaded when nothing has kanji
+        parsed = iter(self.backend.parse_many(to_parse, batch_size=batch_size, n_process=n_process)
+                      if to_parse else ())
+
+        # The pieces of a text joined are the text, so their offsets are counted as they come
+        fetched: list[WordBuffer] = list()
+        for text, pieces in zip(texts, splits):
+            words = WordBuffer(text)
+            position = 0
+            for piece, reading in pieces:
+                if reading is None:
+                    words.extend(next(parsed), position)
+                elif reading == "":
+                    words.extend(backends.plain_words(piece), position)
+                else:
+                    words.append(position, position + len(piece), reading)
+                position += len(piece)
+            fetched.append(words)
+        return fetched
+
+    def _user_pieces(self, sentence: str,
+                     dictionary: Optional[user_dict.UserDictionary]) -> list[tuple[str, Optional[str]]]:
+        """
+        Cut the words of the user dictionary out of a sentence in one longest-match pass.
+
+        Args:
+            sentence (str): Sentence with kanji
+            dictionary (Optional[UserDictionary]): User dictionary, or None without it
+
+        Returns:
+            List[Tuple[str, Optional[str]]]: [(piece, katakana of a word, None to parse or "" without kanji), ...]
+        """
+        if dictionary is None:
+            return [(sentence, None)]
+
+        pieces: list[tuple[str, Optional[str]]] = list()
+        position = 0
+        for start, end, reading in dictionary.match(sentence):
+            if position < start:
+                gap = sentence[position:start]
+                pieces.append((gap, None if self._needs_reading(gap) else ""))
+            pieces.append((sentence[start:end], reading))
+            metrics.USER_WORDS.inc("japanese")
+            position = end
+        if position < len(sentence):
+            gap = sentence[position:]
+            pieces.append((gap, None if self._needs_reading(gap) else ""))
+        return pieces
+
+    def _fetch_characters(self, sentences: list[str]) -> WordBuffer:
+        """
+        Convert text to originals and Katakana.
 
         Args:
             sentences List[str]: To convert a text
 
         Returns:
-            List[Tuple[str, str]]: [(original word, katakana), ...]
+            WordBuffer: Words of the sentences joined
         """
-        tokens: list = list()
+        words = WordBuffer("".join(sentences))
+        position = 0
         for sentence in sentences:
-            doc = self.nlp(sentence)
-            for sent in doc.sents:
-                for token in sent:
-                    tokens.append(token)
-
-        words: list = list()
-        for i, token in enumerate(tokens):
-            words.append((token.orth_, token.doc.user_data["reading_forms"][i]))
+            words.extend(self.backend.parse(sentence), position)
+            position += len(sentence)
 
         return words
 
@@ -92,8 +308,7 @@ class Furigana:
         """
         new_words: list[tuple[str, str]] = list()
         for word, reading in words:
-            if (re.search(self.re_kanji, word)
-                    or re.search(self.re_zenkigou, word)):
+            if self._needs_reading(word):
                 new_words.append((word, jaconv.kata2hira(reading)))
             else:
                 new_words.append((word, ""))
@@ -111,16 +326,22 @@ class Furigana:
                 e.g. "<ruby>囲碁<rp>(</rp><rt>いご</rt><rp>)</rp></ruby>..."
         """
 
-        sentences: list[str] = list()
-        for word, reading in words_list:
-            # Extract extra ruby char from word
-            extra_char: list[str] = re.findall(self.re_hiragana, word)
-            for char in extra_char:
-                reading = reading.replace(char, "\u3000")
-            if reading != "":
-                sentences.append(
-                    f"<ruby>{word}<rp>(</rp><rt>{reading}</rt><rp>)</rp></ruby>"
-                )
-            else:
-                sentences.append(word)
-        return sentences
+        return [self._ruby(word, reading) for word, reading in words_list]
+
+    def _ruby(self, word: str, reading: str) -> str:
+        """
+        Putting a <ruby> tag on a word.
+
+        Args:
+            word (str): e.g. "囲碁"
+            reading (str): Hiragana, e.g. "いご", or "" to keep the word as it is
+        Returns:
+            str: e.g. "<ruby>囲碁<rp>(</rp><rt>いご</rt><rp>)</rp></ruby>"
+        """
+        # Extract extra ruby char from word
+        extra_char: list[str] = re.findall(self.re_hiragana, word)
+        for char in extra_char:
+            reading = reading.replace(char, "\u3000")
+        if reading != "":
+            return f"<ruby>{word}<rp>(</rp><rt>{reading}</rt><rp>)</rp></ruby>"
+        return word
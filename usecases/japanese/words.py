@@ -0,0 +1,80 @@
+from array import array
+from typing import Iterator
+
+
+class WordBuffer:
+    """
+    Words of a text and their readings, kept in columns.
+
+    A word is kept as its offsets in the text instead of its own string,
+    so a word costs two integers in the arrays and a reference to its reading.
+    The parsed document isn't kept; the buffer is filled once and the document is released.
+    """
+    __slots__ = ("text", "starts", "ends", "readings")
+
+    def __init__(self, text: str) -> None:
+        """
+        Args:
+            text (str): Text of the words
+        """
+        self.text = text
+        self.starts = array("I")
+        self.ends = array("I")
+        self.readings: list[str] = list()
+
+    def append(self, start: int, end: int, reading: str) -> None:
+        """
+        Add a word.
+
+        Args:
+            start (int): Offset of the word in the text
+            end (int): Offset after the word, text[start:end] is the word
+            reading (str): Katakana, or "" when it has nothing to read
+        """
+        self.starts.append(start)
+        self.ends.append(end)
+        self.readings.append(reading)
+
+    def extend(self, words: "WordBuffer", offset: int) -> None:
+        """
+        Add the words of a part of the text.
+
+        Args:
+            words (WordBuffer): Words of text[offset:offset + len(words.text)]
+            offset (int): Offset of the part in the text
+        """
+        if offset:
+            self.starts.extend(start + offset for start in words.starts)
+            self.ends.extend(end + offset for end in words.ends)
+        else:
+            self.starts.extend(words.starts)
+            self.ends.extend(words.ends)
+        self.readings.extend(words.readings)
+
+    def surface(self, i: int) -> str:
+        """The i-th word as it is in the text"""
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def spans(self) -> Iterator[tuple[str, str, int, int]]:
+        """
+        Yields:
+            Tuple[str, str, int, int]: (original word, katakana, start, end)
+        """
+        text = self.text
+        for start, end, reading in zip(self.starts, self.ends, self.readings):
+            yield text[start:end], reading, start, end
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        """
+        Yields:
+            Tuple[str, str]: (original word, katakana)
+        """
+        text = self.text
+        for start, end, reading in zip(self.starts, self.ends, self.readings):
+            yield text[start:end], reading
+
+    def __len__(self) -> int:
+        return len(self.readings)
+
+    def __repr__(self) -> str:
+        return f"WordBuffer({list(self)!r})"
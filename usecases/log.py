@@ -1,27 +1,586 @@
-import os
+"""
+Logs of the conversions, written in bulk and read back by pages or exported as a stream.
+
+    $ python -m usecases.log --format jsonl --language japanese --since 2026-01-01 --output logs.jsonl
 
+The ids are ordered by time, so the logs are paged by the last id seen (keyset pagination)
+instead of an offset, and a page costs the same at the end of the table as at the start.
+The logs of a former table without the language are given new ids in the order of their time
+when the table is first opened.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import deque
 from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple, Optional, TextIO
+
+TABLE = "language_helper_logs"
+# The columns in the order of the table
+COLUMNS = "id, created_at, origin, phonetics, ip, language"
+# The other queries filter on these columns and page on the id
+INDEXES: dict[str, str] = {
+    f"{TABLE}_created_at": "created_at",
+    f"{TABLE}_language_id": "language, id",
+}
+EXPORT_FORMATS = ("jsonl", "csv")
+
+# An id is the milliseconds since EPOCH, the node of the process and a sequence in the millisecond.
+# 41 + 10 + 12 bits fit in a signed 64-bit integer until 2090.
+EPOCH = 1_609_459_200  # 2021-01-01 UTC
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+
+
+class LogEntry(NamedTuple):
+    id: int
+    created_at: datetime
+    origin: str
+    phonetics: str
+    ip: str
+    # "japanese", "english" or "mixed"; "" for the logs written before the language was logged
+    language: str = ""
+
+
+class LogIds:
+    """
+    Unique ids ordered by time.
+    The node of each process is handed out by the database, so the workers on every host make different ids.
+    """
+
+    def __init__(self, node: int) -> None:
+        """
+        Args:
+            node(int): Node of this process, under 2 ** NODE_BITS
+        """
+        self.node = node
+        self._last = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next(self, timestamp: float) -> int:
+        """
+        A new id.
+
+        Args:
+            timestamp(float): Seconds since the epoch of the log
+
+        Returns:
+            (int) Larger than every former id of this process
+        """
+        milliseconds = int((timestamp - EPOCH) * 1000)
+        with self._lock:
+            # The clock going back doesn't make the ids go back
+            if milliseconds <= self._last:
+                milliseconds = self._last
+                self._sequence += 1
+                if self._sequence >> SEQUENCE_BITS:
+                    # The sequence of the millisecond is used up, so the next one is borrowed
+                    milliseconds += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._last = milliseconds
+            return (milliseconds << NODE_BITS | self.node) << SEQUENCE_BITS | self._sequence
+
+
+def _rekeyed(rows: Iterable[tuple], node: int) -> list[tuple[int, object]]:
+    """
+    New ids of the logs of a former table, whose ids were hashes of their time.
+
+    Args:
+        rows(Iterable[tuple]): (key of the row, created_at) in the order of created_at
+        node(int): Node of this process
+
+    Returns:
+        (list[tuple[int, object]]) [(new id, key of the row), ...]
+    """
+    ids = LogIds(node)
+    return [(ids.next(created_at.timestamp() if created_at else EPOCH), key) for key, created_at in rows]
+
+
+def _where(placeholder: str, after: Optional[int], language: Optional[str],
+           since: Optional[datetime], until: Optional[datetime]) -> tuple[str, list]:
+    """
+    WHERE clause of the filters.
+
+    Args:
+        placeholder(str): "?" for SQLite, "%s" for PostgreSQL
+        after(Optional[int]): Only the logs after this id
+        language(Optional[str]): Only the logs of this language
+        since(Optional[datetime]): Only the logs created at or after this time
+        until(Optional[datetime]): Only the logs created before this time
+
+    Returns:
+        (tuple[str, list]) The clause, "" without filters, and its parameters
+    """
+    conditions: list[str] = list()
+    params: list = list()
+    for condition, value in (("id > {}", after), ("language = {}", language),
+                             ("created_at >= {}", since), ("created_at < {}", until)):
+        if value is not None:
+            conditions.append(condition.format(placeholder))
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def _matches(entry: LogEntry, after: Optional[int], language: Optional[str],
+             since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """The entry passes the filters of `_where`"""
+    return ((after is None or entry.id > after) and (language is None or entry.language == language)
+            and (since is None or entry.created_at >= since) and (until is None or entry.created_at < until))
+
+
+class PostgresBackend:
+    """Write the logs to PostgreSQL through a pool of connections."""
+
+    def __init__(self, dsn: Optional[str] = None, min_connections: int = 1, max_connections: int = 4) -> None:
+        # psycopg2 is only needed when the logs go to PostgreSQL
+        import psycopg2.extras
+        import psycopg2.pool
+
+        self._execute_values = psycopg2.extras.execute_values
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            min_connections, max_connections, dsn or os.environ.get('DATABASE_URL'))
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """
+        Create the table and its indexes, and take the node of this process from a sequence.
+        A former table gets the language, and its logs get new ids in the order of their time.
+        """
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (id BIGINT PRIMARY KEY, created_at TIMESTAMP, "
+                            "origin TEXT, phonetics TEXT, ip TEXT, language TEXT NOT NULL DEFAULT '')")
+                cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {TABLE}_nodes")
+                cur.execute("SELECT nextval(%s)", (f"{TABLE}_nodes",))
+                self.node = cur.fetchone()[0] % (1 << NODE_BITS)
+                # The workers starting together wait for the one migrating the table
+                cur.execute(f"LOCK TABLE {TABLE} IN SHARE ROW EXCLUSIVE MODE")
+                cur.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                            (TABLE, "language"))
+                if cur.fetchone() is None:
+                    cur.execute(f"ALTER TABLE {TABLE} ADD COLUMN language TEXT NOT NULL DEFAULT ''")
+                    # The former ids may be shared by logs of the same time, so the rows are found by ctid
+                    cur.execute(f"SELECT ctid, created_at FROM {TABLE} ORDER BY created_at, ctid")
+                    rows = _rekeyed(cur.fetchall(), self.node)
+                    self._execute_values(cur, f"UPDATE {TABLE} SET id = rekeyed.id "
+                                              f"FROM (VALUES %s) AS rekeyed (id, ctid) "
+                                              f"WHERE {TABLE}.ctid = rekeyed.ctid::tid", rows)
+                    cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {TABLE}_id ON {TABLE} (id)")
+                for name, columns in INDEXES.items():
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({columns})")
+        finally:
+            self._pool.putconn(conn)
+
+    def write(self, entries: list[LogEntry]) -> None:
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                self._execute_values(cur, f"INSERT INTO {TABLE} ({COLUMNS}) VALUES %s", entries)
+        finally:
+            self._pool.putconn(conn)
+
+    def read_id(self, id: int) -> Optional[LogEntry]:
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"SELECT {COLUMNS} FROM {TABLE} WHERE id = %s", (id,))
+                row = cur.fetchone()
+        finally:
+            self._pool.putconn(conn)
+        return LogEntry(*row) if row else None
+
+    def page(self, after: Optional[int] = None, limit: int = 100, language: Optional[str] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[LogEntry]:
+        where, params = _where("%s", after, language, since, until)
+        conn = self._pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"SELECT {COLUMNS} FROM {TABLE}{where} ORDER BY id LIMIT %s", (*params, limit))
+                rows = cur.fetchall()
+        finally:
+            self._pool.putconn(conn)
+        return [LogEntry(*row) for row in rows]
+
+    def scan(self, language: Optional[str] = None, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, batch_size: int = 1_000) -> Iterator[LogEntry]:
+        """The logs in the order of the ids, fetched batch_size rows at a time by a server-side cursor"""
+        where, params = _where("%s", None, language, since, until)
+        conn = self._pool.getconn()
+        try:
+            # A named cursor keeps the result on the server
+            with conn, conn.cursor(name=f"{TABLE}_scan") as cur:
+                cur.itersize = batch_size
+                cur.execute(f"SELECT {COLUMNS} FROM {TABLE}{where} ORDER BY id", params)
+                for row in cur:
+                    yield LogEntry(*row)
+        finally:
+            self._pool.putconn(conn)
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+class SQLiteBackend:
+    """Write the logs to SQLite, to run without a PostgreSQL server."""
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            # The workers starting together on the same file wait for the one migrating the table
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (id INTEGER PRIMARY KEY, created_at TIMESTAMP, "
+                               "origin TEXT, phonetics TEXT, ip TEXT, language TEXT NOT NULL DEFAULT '')")
+            # Every process takes the next node, and only the last one is kept
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE}_nodes (node INTEGER PRIMARY KEY AUTOINCREMENT)")
+            taken = self._conn.execute(f"INSERT INTO {TABLE}_nodes DEFAULT VALUES").lastrowid
+            self._conn.execute(f"DELETE FROM {TABLE}_nodes WHERE node < ?", (taken,))
+            self.node = taken % (1 << NODE_BITS)
+
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({TABLE})")]
+            if "language" not in columns:
+                self._conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN language TEXT NOT NULL DEFAULT ''")
+                # The former ids may be shared by logs of the same time, so the rows are found by rowid
+                rows = self._conn.execute(f"SELECT rowid, created_at FROM {TABLE} "
+                                          "ORDER BY created_at, rowid").fetchall()
+                self._conn.executemany(f"UPDATE {TABLE} SET id = ? WHERE rowid = ?", _rekeyed(rows, self.node))
+                self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {TABLE}_id ON {TABLE} (id)")
+            for name, columns in INDEXES.items():
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({columns})")
+
+    def write(self, entries: list[LogEntry]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT INTO {TABLE} ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", entries)
+
+    def read_id(self, id: int) -> Optional[LogEntry]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {COLUMNS} FROM {TABLE} WHERE id = ?", (id,)).fetchone()
+        return LogEntry(*row) if row else None
+
+    def page(self, after: Optional[int] = None, limit: int = 100, language: Optional[str] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[LogEntry]:
+        where, params = _where("?", after, language, since, until)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {COLUMNS} FROM {TABLE}{where} ORDER BY id LIMIT ?",
+                                      (*params, limit)).fetchall()
+        return [LogEntry(*row) for row in rows]
+
+    def scan(self, language: Optional[str] = None, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, batch_size: int = 1_000) -> Iterator[LogEntry]:
+        """
+        The logs in the order of the ids, read by pages.
+        The connection is shared with the writer, so it is only held for a page at a time.
+        """
+        after: Optional[int] = None
+        while True:
+            entries = self.page(after, batch_size, language, since, until)
+            yield from entries
+            if len(entries) < batch_size:
+                return
+            after = entries[-1].id
+
+    def close(self) -> None:
+        self._conn.close()
 
-import psycopg2
+
+class MemoryBackend:
+    """Keep the latest logs in memory in the order of the ids, for tests and development."""
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        """
+        Args:
+            max_entries(int): Number of logs kept; the oldest ones are discarded
+        """
+        # Only this process writes the logs
+        self.node = 0
+        self.entries: deque[LogEntry] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def write(self, entries: list[LogEntry]) -> None:
+        with self._lock:
+            for entry in entries:
+                if not self.entries or self.entries[-1].id < entry.id:
+                    self.entries.append(entry)
+                    continue
+                # The ids of this process only go up, so this is rare and near the end
+                if len(self.entries) == self.entries.maxlen:
+                    self.entries.popleft()
+                position = len(self.entries)
+                while position and self.entries[position - 1].id > entry.id:
+                    position -= 1
+                self.entries.insert(position, entry)
+
+    def read_id(self, id: int) -> Optional[LogEntry]:
+        with self._lock:
+            return next((entry for entry in self.entries if entry.id == id), None)
+
+    def page(self, after: Optional[int] = None, limit: int = 100, language: Optional[str] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[LogEntry]:
+        with self._lock:
+            return list(itertools.islice(self._select(after, language, since, until), limit))
+
+    def scan(self, language: Optional[str] = None, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, batch_size: int = 1_000) -> Iterator[LogEntry]:
+        with self._lock:
+            entries = list(self._select(None, language, since, until))
+        return iter(entries)
+
+    def _select(self, after: Optional[int], language: Optional[str],
+                since: Optional[datetime], until: Optional[datetime]) -> Iterator[LogEntry]:
+        """The logs passing the filters, which are already in the order of the ids"""
+        for entry in self.entries:
+            if _matches(entry, after, language, since, until):
+                yield entry
+
+    def close(self) -> None:
+        pass
+
+
+def export(entries: Iterable[LogEntry], f: TextIO, output_format: str = "jsonl") -> int:
+    """
+    Write the logs as they are read, without keeping them.
+
+    Args:
+        entries(Iterable[LogEntry]): Logs, e.g. by `scan`
+        f(TextIO): Output
+        output_format(str): "jsonl" or "csv" with a header
+
+    Returns:
+        (int) The number of the logs written
+    """
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"{output_format} is not a format of the export.")
+
+    writer = csv.writer(f) if output_format == "csv" else None
+    if writer is not None:
+        writer.writerow(LogEntry._fields)
+    count = 0
+    for entry in entries:
+        entry = entry._replace(created_at=entry.created_at.isoformat())
+        if writer is not None:
+            writer.writerow(entry)
+        else:
+            f.write(json.dumps(entry._asdict(), ensure_ascii=False) + "\n")
+        count += 1
+    return count
 
 
 class Logs:
+    """
+    Buffer the logs in memory and write them in bulk from a background thread.
+
+    `create` never waits for the database. When the buffer is full,
+    the new entry is dropped ("drop") or the oldest one is discarded ("evict").
+    """
+
+    OVERFLOWS = ("drop", "evict")
+
+    def __init__(self, backend, max_queue: int = 10_000, batch_size: int = 500,
+                 flush_interval: float = 1.0, overflow: str = "drop") -> None:
+        """
+        Args:
+            backend: PostgresBackend, SQLiteBackend or MemoryBackend
+            max_queue(int): Number of entries buffered
+            batch_size(int): The buffer is flushed when it has this number of entries
+            flush_interval(float): Seconds between the flushes at the latest
+            overflow(str): "drop" or "evict"
+        """
+        if overflow not in self.OVERFLOWS:
+            raise ValueError(f"{overflow} is not a policy of overflow.")
 
-    @staticmethod
-    def create(origin: str, phonetics: str, ip: str) -> None:
+        self.backend = backend
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.ids = LogIds(backend.node)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer: deque = deque()
+        self._wake = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="logs-flusher", daemon=True)
+        self._thread.start()
+
+    def create(self, origin: str, phonetics: str, ip: str, language: str = "") -> None:
+        """
+        Buffer a log of a conversion.
+
+        Args:
+            origin(str): Original text
+            phonetics(str): Converted HTML
+            ip(str): Address of the client
+            language(str): "japanese", "english" or "mixed"
+        """
         now = datetime.now()
-        id = hash(now)
+        entry = LogEntry(self.ids.next(now.timestamp()), now, origin, phonetics, ip, language)
+
+        with self._wake:
+            if len(self._buffer) >= self.max_queue:
+                self.dropped += 1
+                if self.overflow == "drop":
+                    return
+                self._buffer.popleft()
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._wake.notify()
+
+    def read_id(self, id: int) -> Optional[LogEntry]:
+        return self.backend.read_id(id)
+
+    def page(self, after: Optional[int] = None, limit: int = 100, language: Optional[str] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[LogEntry]:
+        """
+        A page of the written logs in the order of the ids.
+
+        The logs are written up to flush_interval after they are created, and their ids are made at creation,
+        so a log flushed late may land below an `after` the reader has already passed.
+        A reader paging through every log has to stay behind the live tail:
+        pass an `until` at least flush_interval, plus the time of a write, before now.
+
+        Args:
+            after(Optional[int]): The id of the last log of the former page, None for the first page
+            limit(int): Number of logs of the page
+            language(Optional[str]): Only the logs of this language
+            since(Optional[datetime]): Only the logs created at or after this time
+            until(Optional[datetime]): Only the logs created before this time
+
+        Returns:
+            (list[LogEntry]) Fewer than limit logs on the last page
+        """
+        return self.backend.page(after, limit, language, since, until)
+
+    def export(self, f: TextIO, output_format: str = "jsonl", language: Optional[str] = None,
+               since: Optional[datetime] = None, until: Optional[datetime] = None,
+               batch_size: int = 1_000) -> int:
+        """
+        Stream the written logs to a file in the order of the ids.
+
+        Returns:
+            (int) The number of the logs written
+        """
+        return export(self.backend.scan(language, since, until, batch_size), f, output_format)
+
+    def flush(self) -> None:
+        """Write every buffered entry."""
+        while True:
+            with self._wake:
+                entries = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not entries:
+                return
+            try:
+                self.backend.write(entries)
+            except Exception as error:
+                # The requests are never failed by the logs
+                with self._wake:
+                    self.failed += len(entries)
+                print(f"{len(entries)} logs are lost: {error}")
+            else:
+                with self._wake:
+                    self.written += len(entries)
+
+    def _run(self) -> None:
+        while not self._closed:
+            with self._wake:
+                if len(self._buffer) < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background thread after writing the rest."""
+        self._closed = True
+        with self._wake:
+            self._wake.notify()
+        self._thread.join()
+        self.flush()
+        self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        with self._wake:
+            return {
+                "buffered": len(self._buffer),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+def open_backend(settings: dict):
+    """
+    Backend configured by the LOG section of the settings.
+
+    Args:
+        settings(dict): LOG section of the settings
+
+    Returns:
+        PostgresBackend, SQLiteBackend, MemoryBackend, or None when BACKEND is "none"
+    """
+    backend_name = settings["BACKEND"]
+    if backend_name == "none":
+        return None
+    elif backend_name == "postgres":
+        return PostgresBackend(settings.get("DSN"), max_connections=settings["MAX_CONNECTIONS"])
+    elif backend_name == "sqlite":
+        return SQLiteBackend(settings["SQLITE_PATH"])
+    elif backend_name == "memory":
+        return MemoryBackend(settings["MEMORY_ENTRIES"])
+    raise ValueError(f"{backend_name} is not a backend of the logs.")
+
+
+def open_logs(settings: dict) -> Optional[Logs]:
+    """
+    Logs configured by the LOG section of the settings.
+
+    Args:
+        settings(dict): LOG section of the settings
+
+    Returns:
+        (Optional[Logs]) None when BACKEND is "none"
+    """
+    backend = open_backend(settings)
+    if backend is None:
+        return None
+
+    return Logs(backend,
+                max_queue=settings["MAX_QUEUE"],
+                batch_size=settings["BATCH_SIZE"],
+                flush_interval=settings["FLUSH_INTERVAL"],
+                overflow=settings["OVERFLOW"])
 
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor()
 
-        cur.execute(f"INSERT INTO language_helper_logs VALUES({id},{now},'{origin}','{phonetics}','{ip}')")
+if __name__ == '__main__':
+    from config.loader import load_settings
 
-    @staticmethod
-    def read_id(id: int):
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
-        cur = conn.cursor()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+    parser.add_argument('--language', choices=['japanese', 'english', 'mixed'])
+    parser.add_argument('--since', type=datetime.fromisoformat, help='e.g. 2026-01-01')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='e.g. 2026-02-01T12:00')
+    parser.add_argument('--batch-size', type=int, default=1_000, help='rows fetched from the database at a time')
+    parser.add_argument('--output', default='-', help='"-" is the standard output')
+    args = parser.parse_args()
 
-        cur.execute(f"SELECT * FROM language_helper_logs WHERE id = {id}")
+    log_backend = open_backend(load_settings()["LOG"])
+    if log_backend is None:
+        sys.exit('The logs are disabled by LOG.BACKEND.')
+    output = sys.stdout if args.output == '-' else open(args.output, mode='w', newline='', encoding='utf-8')
+    try:
+        count = export(log_backend.scan(args.language, args.since, args.until, args.batch_size), output, args.format)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        log_backend.close()
+    print(f"{count} logs are exported.", file=sys.stderr)
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from usecases import cache
+
+PREFIX = "language_helper"
+# Upper bounds of the buckets of the histograms in seconds
+BUCKETS: tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: metric, to render every metric
+METRICS: dict[str, "Counter | Histogram"] = dict()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    """Labels of a sample in the text format of Prometheus, e.g. '{language="japanese"}'"""
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """A value which only goes up, for each combination of the labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        """
+        Args:
+            name(str): Name without the prefix, e.g. "tokens_total"
+            description(str): HELP of the metric
+            labels(tuple[str, ...]): Names of the labels
+        """
+        self.name = f"{PREFIX}_{name}"
+        self.description = description
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = dict()
+        self._lock = threading.Lock()
+        METRICS[self.name] = self
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, *values: str) -> float:
+        return self._values.get(values, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    """Durations counted into cumulative buckets, for each combination of the labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = BUCKETS) -> None:
+        """
+        Args:
+            name(str): Name without the prefix, e.g. "stage_seconds"
+            description(str): HELP of the metric
+            labels(tuple[str, ...]): Names of the labels
+            buckets(tuple[float, ...]): Upper bounds of the buckets, in ascending order
+        """
+        self.name = f"{PREFIX}_{name}"
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # label values: [count of each bucket..., count over the last bucket, sum]
+        self._values: dict[tuple[str, ...], list[float]] = dict()
+        self._lock = threading.Lock()
+        METRICS[self.name] = self
+
+    def observe(self, seconds: float, *values: str) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._values.get(values)
+            if counts is None:
+                counts = self._values[values] = [0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += seconds
+
+    @contextmanager
+    def time(self, *values: str) -> Iterator[None]:
+        """Observe the duration of the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *values)
+
+    def count(self, *values: str) -> int:
+        counts = self._values.get(values)
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(label_values, list(counts)) for label_values, counts in self._values.items()]
+        for label_values, counts in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, label_values, le=bound)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {counts[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}"
+
+
+STAGE_SECONDS = Histogram("stage_seconds", "Seconds of each stage of the conversions.", ("language", "stage"))
+CONVERSION_SECONDS = Histogram("conversion_seconds", "Seconds of a whole conversion.", ("language",))
+REQUEST_SECONDS = Histogram("request_seconds", "Seconds of the HTTP requests.", ("method", "route"))
+TOKENS = Counter("tokens_total", "Tokens converted by the engines.", ("language",))
+OOV = Counter("oov_total", "Words missing in the dictionary.", ("language",))
+SENTENCES = Counter("sentences_total", "Sentences parsed by the model or skipped without kanji.", ("language", "path"))
+COALESCED = Counter("coalesced_total", "Conversions which awaited the same conversion in flight.", ("language",))
+USER_WORDS = Counter("user_words_total", "Words read from the user dictionaries.", ("language",))
+LIMITED = Counter("limited_requests_total", "Requests cut, delayed or rejected by the admission control.", ("reason",))
+SLOW = Counter("slow_conversions_total", "Conversions over the threshold of the profiler.", ("language",))
+
+
+def stage(language: str, name: str):
+    """
+    Observe the duration of a stage of a conversion.
+
+        with metrics.stage("japanese", "render"):
+            html = self._render(words)
+
+    Args:
+        language(str): "japanese" or "english"
+        name(str): e.g. "tokenize", "reading", "lookup", "render", "template" or "log"
+    """
+    return STAGE_SECONDS.time(language, name)
+
+
+def render() -> str:
+    """Every metric and the counters of the caches in the text format of Prometheus."""
+    lines: list[str] = list()
+    for metric in METRICS.values():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+
+    cache_stats = cache.stats()
+    for key, kind, description in (("hits", "counter", "Hits of the caches."),
+                                   ("misses", "counter", "Misses of the caches."),
+                                   ("evictions", "counter", "Entries evicted from the caches."),
+                                   ("size", "gauge", "Entries in the caches.")):
+        name = f"{PREFIX}_cache_{key}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{_labels(('cache',), (cache_name,))} {info[key]}"
+                     for cache_name, info in cache_stats.items())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,99 @@
+import re
+from typing import Iterator
+
+# Languages of the spans which get pronunciations. The other spans are kept as they are.
+LANGUAGES = ("japanese", "english")
+
+# One scan splits the text into line breaks, runs of Latin words with the ASCII between them,
+# and runs of the other characters, e.g. Japanese with its digits and punctuation.
+RE_SCRIPT = re.compile(r"(?P<breaks>[\r\n]+)|(?P<latin>[A-Za-z][ -~\t]*)|(?P<other>[^A-Za-z\r\n]+)")
+RE_KANJI = re.compile("[一-龥]")
+
+# (kind, start, end): kind is "japanese", "english", "plain" or "breaks", text[start:end] is the span
+Span = tuple[str, int, int]
+
+
+def segment(text: str) -> list[Span]:
+    """
+    Split the text by script in one linear scan.
+
+    Args:
+        text(str): e.g. "漢字 and かな"
+
+    Returns:
+        (list[Span]) Spans covering the text in order,
+            e.g. [("japanese", 0, 2), ("plain", 2, 3), ("english", 3, 6), ("plain", 6, 9)]
+    """
+    spans: list[Span] = list()
+    for match in RE_SCRIPT.finditer(text):
+        start, end = match.span()
+        if match.lastgroup == "breaks":
+            spans.append(("breaks", start, end))
+        elif match.lastgroup == "latin":
+            # The spaces around the words are kept as they are
+            words = match.group().strip()
+            words_start = start + match.group().index(words)
+            spans.extend(_plain(start, words_start))
+            spans.append(("english", words_start, words_start + len(words)))
+            spans.extend(_plain(words_start + len(words), end))
+        else:
+            spans.append(("japanese" if RE_KANJI.search(match.group()) else "plain", start, end))
+    return spans
+
+
+def _plain(start: int, end: int) -> Iterator[Span]:
+    if start < end:
+        yield "plain", start, end
+
+
+def texts_of(text: str, spans: list[Span], language: str) -> list[str]:
+    """The spans of the language, to convert them at once"""
+    return [text[start:end] for kind, start, end in spans if kind == language]
+
+
+def stitch_html(text: str, spans: list[Span], converted: dict[str, list[str]]) -> str:
+    """
+    HTML of the whole text from the converted spans.
+
+    Args:
+        text(str): Original text
+        spans(list[Span]): Spans of the text by `segment`
+        converted(dict[str, list[str]]): language: HTML of its spans in order
+
+    Returns:
+        (str) HTML, with the line breaks written as the engines write them
+    """
+    fragments = {language: iter(htmls) for language, htmls in converted.items()}
+    html: list[str] = list()
+    for kind, start, end in spans:
+        if kind == "breaks":
+            html.append("<br>\n" * len(text[start:end].splitlines()))
+        elif kind == "plain":
+            html.append(text[start:end])
+        elif kind == "english":
+            # IPA puts a space after every word; the spaces of the text are kept instead
+            html.append(next(fragments[kind]).rstrip(" "))
+        else:
+            html.append(next(fragments[kind]))
+    return "".join(html)
+
+
+def stitch_tokens(spans: list[Span],
+                  converted: dict[str, list[list[tuple[str, str, int, int]]]]) -> list[tuple[str, str, int, int]]:
+    """
+    Tokens of the whole text from the tokens of the spans.
+
+    Args:
+        spans(list[Span]): Spans of the text by `segment`
+        converted(dict[str, list[list[tuple[str, str, int, int]]]]): language: tokens of its spans in order
+
+    Returns:
+        (list[tuple[str, str, int, int]]) [(word, reading, start, end), ...] with the offsets in the whole text
+    """
+    tokens_of = {language: iter(tokens) for language, tokens in converted.items()}
+    tokens: list[tuple[str, str, int, int]] = list()
+    for kind, start, _ in spans:
+        if kind in LANGUAGES:
+            tokens.extend((word, reading, start + word_start, start + word_end)
+                          for word, reading, word_start, word_end in next(tokens_of[kind]))
+    return tokens
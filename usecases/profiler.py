@@ -0,0 +1,106 @@
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from config.loader import load_settings
+from usecases import metrics
+
+
+class SlowProfiler:
+    """
+    Sampling profiler of the conversions.
+
+    While a conversion runs, a background thread samples the stack of its thread.
+    The samples are thrown away unless the conversion takes longer than the threshold,
+    so the profiler costs nothing but the sampling thread for the fast conversions.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, top: int = 5) -> None:
+        """
+        Args:
+            threshold(float): Seconds over which a conversion is reported
+            interval(float): Seconds between the samples
+            top(int): Number of the most frequent stacks reported
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        # thread id: how many times each stack is sampled
+        self._active: dict[int, collections.Counter] = dict()
+        self._wake = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def profile(self, language: str, characters: int = 0) -> Iterator[None]:
+        """
+        Sample the current thread during the block and report it when it is slow.
+
+        Args:
+            language(str): "japanese" or "english"
+            characters(int): Length of the converted text, to report it
+        """
+        ident = threading.get_ident()
+        stacks: collections.Counter = collections.Counter()
+        with self._wake:
+            self._active[ident] = stacks
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-profiler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._wake:
+                del self._active[ident]
+            if seconds >= self.threshold:
+                metrics.SLOW.inc(language)
+                self.report(language, characters, seconds, stacks)
+
+    def _run(self) -> None:
+        while True:
+            with self._wake:
+                while not self._active:
+                    self._wake.wait()
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+            with self._wake:
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame) -> tuple[str, ...]:
+        """Innermost first, e.g. ("kana_phonetics.py:120 _put_on", ...)"""
+        stack: list[str] = list()
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        return tuple(stack)
+
+    def report(self, language: str, characters: int, seconds: float, stacks: collections.Counter) -> None:
+        samples = sum(stacks.values())
+        print(f"Slow conversion of {language}: {seconds:.3f} seconds, {characters} characters, {samples} samples.")
+        for stack, count in stacks.most_common(self.top):
+            print(f"  {count} samples:")
+            for line in stack[:20]:
+                print(f"    {line}")
+
+
+@lru_cache(maxsize=None)
+def instance() -> Optional[SlowProfiler]:
+    """The profiler of this process, or None when METRICS.SLOW_SECONDS is 0."""
+    settings = load_settings()["METRICS"]
+    if not settings["SLOW_SECONDS"]:
+        return None
+    return SlowProfiler(settings["SLOW_SECONDS"], settings["SAMPLE_INTERVAL"], settings["TOP_STACKS"])
@@ -0,0 +1,116 @@
+import asyncio
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable
+
+from controllers.input import split_sentences
+
+# (sentence, a line break follows it) -> HTML fragment of the sentence
+Render = Callable[[str, bool], Awaitable[str]]
+
+
+class SessionFull(Exception):
+    """The session or the worker is at its limit."""
+
+
+class EditSession:
+    """
+    Conversions of a document being edited.
+
+    The document is kept as its sentences and their HTML fragments.
+    On each edit, only the sentences which aren't in the last version are converted,
+    and the client gets the changes of the list of fragments.
+    """
+
+    def __init__(self, render: Render, max_characters: int = 20_000) -> None:
+        """
+        Args:
+            render(Render): Converts a sentence to its HTML fragment
+            max_characters(int): Size of the document kept by the session
+        """
+        self.render = render
+        self.max_characters = max_characters
+        self.text = ""
+        self.version = 0
+        self._sentences: list[tuple[str, bool]] = list()
+        self._fragments: list[str] = list()
+
+    def apply(self, message: dict) -> str:
+        """
+        The text after a message of the client.
+
+        Args:
+            message(dict): {"text": whole text} or {"edit": {"start": int, "end": int, "text": str}},
+                which replaces text[start:end]
+
+        Returns:
+            (str) New text
+
+        Raises:
+            ValueError: When the message is neither of them
+        """
+        if isinstance(message.get("text"), str):
+            return message["text"]
+        edit = message.get("edit")
+        if not isinstance(edit, dict) or not isinstance(edit.get("text"), str):
+            raise ValueError("A message needs \"text\" or \"edit\".")
+        start, end = edit.get("start"), edit.get("end")
+        if not (isinstance(start, int) and isinstance(end, int) and 0 <= start <= end <= len(self.text)):
+            raise ValueError(f"The edit [{start}, {end}] is out of the text of {len(self.text)} characters.")
+        return self.text[:start] + edit["text"] + self.text[end:]
+
+    async def update(self, text: str) -> list[dict]:
+        """
+        Convert the changed sentences of the text.
+
+        Args:
+            text(str): New text of the document
+
+        Returns:
+            (list[dict]) Changes, applied in order to the list of fragments:
+                fragments[start:start + delete] = insert
+
+        Raises:
+            SessionFull: When the text is longer than max_characters
+        """
+        if len(text) > self.max_characters:
+            raise SessionFull(f"The text is longer than {self.max_characters} characters.")
+
+        sentences = split_sentences(text)
+        rendered: dict[tuple[str, bool], str] = dict(zip(self._sentences, self._fragments))
+        missing = list(dict.fromkeys(sentence for sentence in sentences if sentence not in rendered))
+        for sentence, fragment in zip(missing, await asyncio.gather(*(self.render(*key) for key in missing))):
+            rendered[sentence] = fragment
+
+        fragments = [rendered[sentence] for sentence in sentences]
+        changes: list[dict] = list()
+        matcher = SequenceMatcher(a=self._sentences, b=sentences, autojunk=False)
+        for tag, old_start, old_end, start, end in matcher.get_opcodes():
+            if tag != "equal":
+                changes.append({"start": start, "delete": old_end - old_start, "insert": fragments[start:end]})
+
+        self.text = text
+        self.version += 1
+        self._sentences = sentences
+        self._fragments = fragments
+        return changes
+
+
+class Sessions:
+    """Number of the sessions of this worker, bounded to bound their memory."""
+
+    def __init__(self, max_sessions: int = 100) -> None:
+        self.max_sessions = max_sessions
+        self.active = 0
+
+    def open(self, render: Render, max_characters: int) -> EditSession:
+        """
+        Raises:
+            SessionFull: When the worker already has max_sessions
+        """
+        if self.active >= self.max_sessions:
+            raise SessionFull(f"{self.active} sessions are already open.")
+        self.active += 1
+        return EditSession(render, max_characters)
+
+    def close(self, session: EditSession) -> None:
+        self.active -= 1
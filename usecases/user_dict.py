@@ -0,0 +1,300 @@
+"""
+Words with known readings, read before the model and the CMU dictionary.
+
+The source is a TSV file of "surface<TAB>reading" lines. Lines starting with "#" are comments.
+For Japanese, the reading is in kana; for English, the surface is one or more words and the reading is IPA.
+The words of an English surface are compared without their case and punctuation, e.g. "Wi-Fi" as "wifi".
+The source is compiled ahead of time into a double-array trie, which is mapped into memory:
+
+    $ python -m usecases.user_dict japanese names.tsv --output names.dic
+    $ python -m usecases.user_dict english terms.tsv --output terms.dic
+
+A running server reads a new compiled file without a restart. The file is mapped into memory,
+so a new one must be renamed over the former, as the compiler does, instead of being written in place.
+"""
+import argparse
+import csv
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Optional
+
+import dartsclone
+
+# The offsets table is written in native byte order, so the byte order is part of the magic.
+MAGIC = b'USRDIC1' + (b'L' if sys.byteorder == 'little' else b'B')
+# magic, units of the trie, number of words, bytes of the longest surface
+HEADER = struct.Struct('8sIII')
+# Bytes of a unit of the trie of dartsclone
+UNIT_SIZE = 4
+# Characters of an English word which aren't looked up, by IPA as by the user dictionary
+RE_ENGLISH_IGNORED = re.compile("[^a-zA-Z0-9']")
+
+
+def english_key(word: str) -> str:
+    """An English word as it is looked up, e.g. "Wi-Fi" -> "wifi" """
+    return RE_ENGLISH_IGNORED.sub("", word).lower()
+
+
+def katakana(text: str) -> str:
+    """Hiragana of the text in katakana, as the backends give the readings"""
+    return "".join(chr(ord(char) + 0x60) if "ぁ" <= char <= "ゖ" else char for char in text)
+
+
+class UserDictionary:
+    """
+    Read-only view of a compiled user dictionary.
+
+    Layout:
+        header | trie (units of dartsclone) | offsets (uint32 * (count + 1)) | readings (UTF-8)
+        The value of a surface in the trie is the index of its reading.
+
+    A match looks up the trie once per position with at most the longest surface,
+    so the cost is linear in the length of the text whatever the number of words.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, mode='rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, units, self._count, self.max_key_bytes = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled user dictionary.")
+
+        trie_end = HEADER.size + units * UNIT_SIZE
+        self._trie = dartsclone.DoubleArray()
+        self._trie.set_array(memoryview(self._mm)[HEADER.size:trie_end], units)
+
+        offsets_end = trie_end + 4 * (self._count + 1)
+        self._offsets = memoryview(self._mm)[trie_end:offsets_end].cast('I')
+        self._readings = offsets_end
+
+    def reading(self, index: int) -> str:
+        start = self._readings + self._offsets[index]
+        end = self._readings + self._offsets[index + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def _prefixes(self, key: bytes) -> list[tuple[int, int]]:
+        """(index of the reading, bytes of the surface) of the surfaces starting the key, shortest first"""
+        return self._trie.common_prefix_search(key[:self.max_key_bytes], pair_type=True)
+
+    def match(self, text: str) -> list[tuple[int, int, str]]:
+        """
+        The longest surfaces in the text, from the left, without overlaps.
+
+        Args:
+            text(str): e.g. "樹木希林は"
+
+        Returns:
+            (list[tuple[int, int, str]]) [(start, end, reading), ...], text[start:end] is the surface
+        """
+        data = text.encode('utf-8')
+        # Byte offset of each character, and the character at each byte offset
+        offsets: list[int] = list()
+        position = 0
+        for char in text:
+            offsets.append(position)
+            position += len(char.encode('utf-8'))
+        characters = {offset: i for i, offset in enumerate(offsets)}
+        characters[len(data)] = len(text)
+
+        matches: list[tuple[int, int, str]] = list()
+        i = 0
+        while i < len(text):
+            found = self._prefixes(data[offsets[i]:offsets[i] + self.max_key_bytes])
+            if not found:
+                i += 1
+                continue
+            index, length = found[-1]
+            end = characters[offsets[i] + length]
+            matches.append((i, end, self.reading(index)))
+            i = end
+        return matches
+
+    def match_words(self, words: list[str]) -> list[tuple[int, int, str]]:
+        """
+        The longest phrases in the words, from the left, without overlaps.
+        A phrase only matches whole words.
+
+        Args:
+            words(list[str]): Lower case words, e.g. ["in", "new", "york"]
+
+        Returns:
+            (list[tuple[int, int, str]]) [(first word, word after the last, reading), ...]
+        """
+        matches: list[tuple[int, int, str]] = list()
+        i = 0
+        while i < len(words):
+            # The words from i joined by spaces, as long as a surface can be
+            parts: list[bytes] = list()
+            ends: dict[int, int] = dict()
+            length = -1
+            for j in range(i, len(words)):
+                part = words[j].encode('utf-8')
+                length += len(part) + 1
+                if length > self.max_key_bytes:
+                    break
+                parts.append(part)
+                ends[length] = j + 1
+
+            found = [(index, ends[length]) for index, length in self._prefixes(b" ".join(parts)) if length in ends]
+            if not found:
+                i += 1
+                continue
+            index, end = found[-1]
+            matches.append((i, end, self.reading(index)))
+            i = end
+        return matches
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def read_source(path: str, language: str) -> dict[bytes, str]:
+    """
+    Surfaces and readings of a source file.
+
+    Args:
+        path(str): TSV file of "surface<TAB>reading"
+        language(str): "japanese" or "english"
+
+    Returns:
+        (dict[bytes, str]) surface: reading. A surface written again overrides the former.
+    """
+    words: dict[bytes, str] = dict()
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) < 2 or row[0].startswith('#'):
+                continue
+            surface, reading = row[0].strip(), row[1].strip()
+            if language == "english":
+                # Looked up by the words as IPA looks them up, joined by a space
+                keys = [english_key(word) for word in surface.split()]
+                if not all(keys):
+                    print(f"{surface} is skipped, since a word of it has nothing to look up.")
+                    continue
+                surface = " ".join(keys)
+            else:
+                reading = katakana(reading)
+            if surface:
+                words[surface.encode('utf-8')] = reading
+    return words
+
+
+def build(words: dict[bytes, str], path: str) -> int:
+    """
+    Compile the words into a user dictionary.
+
+    Args:
+        words(dict[bytes, str]): surface: reading
+        path(str): Output path
+
+    Returns:
+        (int) The number of words
+    """
+    keys = sorted(words)
+    trie = dartsclone.DoubleArray()
+    trie.build(keys, values=list(range(len(keys))))
+
+    offsets = array('I', [0])
+    readings = bytearray()
+    for key in keys:
+        readings += words[key].encode('utf-8')
+        offsets.append(len(readings))
+
+    header = HEADER.pack(MAGIC, trie.size(), len(keys), max((len(key) for key in keys), default=0))
+    # Write to a temporary file and rename it, so the running workers never see a half written dictionary.
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, mode='wb') as f:
+        f.write(header)
+        f.write(trie.array())
+        f.write(offsets.tobytes())
+        f.write(readings)
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+class ReloadingDictionary:
+    """
+    A compiled user dictionary, replaced when its file changes.
+    The file is checked at most once per interval, so the lookups don't stat it every time.
+    """
+
+    def __init__(self, path: str, interval: float = 5.0, on_reload: Optional[Callable[[], None]] = None) -> None:
+        """
+        Args:
+            path(str): Compiled user dictionary, which may not exist yet
+            interval(float): Seconds between the checks of the file
+            on_reload(Optional[Callable[[], None]]): Called after a new dictionary is read,
+                e.g. to clear the results converted with the former one
+        """
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.dictionary: Optional[UserDictionary] = None
+        self.fingerprint: tuple[int, ...] = ()
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        """Version of the words, e.g. "user=1234-1630000000000000000" """
+        self.current()
+        return "user=" + "-".join(str(value) for value in self.fingerprint[:2]) if self.fingerprint else "user=none"
+
+    def current(self) -> Optional[UserDictionary]:
+        """The dictionary read from the latest file, or None when there is no file"""
+        if time.monotonic() - self._checked >= self.interval:
+            with self._lock:
+                if time.monotonic() - self._checked >= self.interval:
+                    self._reload()
+                    self._checked = time.monotonic()
+        return self.dictionary
+
+    def _reload(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        fingerprint = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if fingerprint == self.fingerprint:
+            return
+        try:
+            dictionary = UserDictionary(self.path)
+        except (OSError, ValueError, struct.error) as error:
+            # The former words are kept until a valid file is written
+            print(f"The user dictionary {self.path} can't be read: {error}")
+            return
+        # The former dictionary is closed by the garbage collector, since a conversion may be reading it
+        self.dictionary = dictionary
+        self.fingerprint = fingerprint
+        print(f"{len(dictionary)} words are read from {self.path}.")
+        if self.on_reload is not None:
+            self.on_reload()
+
+
+def open_dictionary(path: str, interval: float = 5.0,
+                    on_reload: Optional[Callable[[], None]] = None) -> Optional[ReloadingDictionary]:
+    """The user dictionary of the path, or None when the path is empty"""
+    if not path:
+        return None
+    return ReloadingDictionary(path, interval, on_reload)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('language', choices=['japanese', 'english'])
+    parser.add_argument('sources', nargs='+', help='TSV files of "surface<TAB>reading"')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    words: dict[bytes, str] = dict()
+    for source in args.sources:
+        words.update(read_source(source, args.language))
+    count = build(words, args.output)
+    print(f"{count} words are written to {args.output}")